@@ -0,0 +1,259 @@
+"""
+Benchmark suite for parser, tautology checking and proof generation.
+
+Every case is run on generated formula families scaled by amount of variables and nesting depth, wall time
+(best of several runs), peak traced memory and proof length are recorded and compared with stored baseline:
+
+    python benchmarks/bench.py                  # compare with benchmarks/baseline.json
+    python benchmarks/bench.py --update         # store current results as baseline
+    python benchmarks/bench.py --quick -k parse # small sizes only, cases whose name contains 'parse'
+
+Exit code is 1 if some case got slower or took more memory than tolerance allows, or changed its proof length.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymathlogic import FormulaParser, adequacy_theorem
+from pymathlogic import theorems
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+TOLERANCE = 0.25                # allowed relative growth of time and memory
+TIME_FLOOR = 1e-3               # time differences below it are noise
+SEED = 2020
+
+
+def implication_chain(n: int) -> str:
+    """
+    x1 -> (x2 -> (... -> (xn -> x1))), tautology of n variables and depth n
+
+    :param n: int - amount of variables
+    :return: str
+    """
+    res = "(x1)"
+    for i in range(n, 0, -1):
+        res = f"((x{i}) -> {res})"
+    return res
+
+
+def negation_tower(depth: int) -> str:
+    """
+    x1 -> !!...!!x1 with 2 * depth negations, tautology of one variable
+
+    :param depth: int
+    :return: str
+    """
+    res = "(x1)"
+    for i in range(2 * depth):
+        res = f"(!{res})"
+    return f"((x1) -> {res})"
+
+
+def syllogism(n: int) -> str:
+    """
+    (x1 -> x2) -> ((x2 -> x3) -> ... -> (x1 -> xn)), tautology of n variables whose every variable has to be split
+
+    :param n: int - amount of variables, at least 2
+    :return: str
+    """
+    res = f"((x1) -> (x{n}))"
+    for i in range(n - 1, 0, -1):
+        res = f"(((x{i}) -> (x{i + 1})) -> {res})"
+    return res
+
+
+def random_formula(n: int, depth: int, rng: random.Random) -> str:
+    """
+    Random formula of n variables, every branch stops at given depth
+
+    :param n: int - amount of variables
+    :param depth: int - nesting depth
+    :param rng: random.Random
+    :return: str
+    """
+    if depth == 0:
+        return f"(x{rng.randint(1, n)})"
+    if rng.random() < 1 / 3:
+        return f"(!{random_formula(n, depth - 1, rng)})"
+    return f"({random_formula(n, depth - 1, rng)} -> {random_formula(n, depth - 1, rng)})"
+
+
+def identity(n: int, depth: int) -> str:
+    """
+    G -> G for random G, tautology whose check can't stop early
+
+    :param n: int - amount of variables
+    :param depth: int - nesting depth of G
+    :return: str
+    """
+    G = random_formula(n, depth, random.Random(SEED + 31 * n + depth))
+    return f"({G} -> {G})"
+
+
+def _proof_length(res) -> int:
+    """
+    :param res: result of measured function
+    :return: int - length of proof if result is theorem or adequacy output, None otherwise
+    """
+    if isinstance(res, tuple) and len(res) == 3 and isinstance(res[2], int):
+        return res[2]
+    return None
+
+
+def _reset():
+    """
+    Drops cached theorems and collects garbage left by previous run
+
+    :return: None
+    """
+    theorems.clear_schema_cache(schemas=True)
+    gc.collect()
+
+
+def measure(setup, fn, repeat: int) -> dict:
+    """
+    Runs fn repeat times for wall time and once more under tracemalloc for peak memory. Every run starts from
+    collected garbage and empty theorem cache, with input built anew by setup and result of previous run dropped,
+    so interned formulas and their compiled programs aren't reused and cases don't depend on the ones run before
+
+    :param setup: function without arguments building input of fn, not measured
+    :param fn: function of setup result
+    :param repeat: int
+    :return: dict {'time': seconds, 'peak': bytes, 'length': proof length or None}
+    """
+    best = None
+    length = None
+    for _ in range(repeat):
+        _reset()
+        arg = setup()
+        start = time.perf_counter()
+        res = fn(arg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        length = _proof_length(res)
+        res = arg = None
+    _reset()
+    arg = setup()
+    tracemalloc.start()
+    fn(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'time': best, 'peak': peak, 'length': length}
+
+
+def _parse(*texts):
+    """
+    :param texts: formula strings
+    :return: function without arguments parsing them, a tuple of formulas if more than one
+    """
+    if len(texts) == 1:
+        return lambda: FormulaParser(texts[0]).parse()
+    return lambda: tuple(FormulaParser(text).parse() for text in texts)
+
+
+def cases(quick: bool):
+    """
+    Benchmark cases. Formulas are kept as strings, so no formula outlives the run it was built for
+
+    :param quick: bool - small sizes only
+    :return: generator of tuples (name, setup function without arguments, function of setup result, repeat)
+    """
+    sizes = [(4, 8), (8, 12)] if quick else [(4, 8), (8, 12), (8, 16), (16, 20)]
+    for n, depth in sizes:
+        text = identity(n, depth)
+        yield f"parse/identity-v{n}-d{depth}", lambda text=text: text, lambda text: FormulaParser(text).parse(), 5
+
+    sizes = [(4, 8), (8, 10)] if quick else [(4, 8), (8, 10), (12, 10), (16, 12)]
+    for backend in ('truth_table', 'bdd', 'dpll', 'gray'):
+        for n, depth in sizes:
+            yield (f"tautology/{backend}/identity-v{n}-d{depth}", _parse(identity(n, depth)),
+                   lambda F, b=backend: F.is_tautology(b), 3)
+        n = 8 if quick else 16
+        yield f"tautology/{backend}/chain-v{n}", _parse(implication_chain(n)), lambda F, b=backend: F.is_tautology(b), 3
+
+    rng = random.Random(SEED)
+    texts = (random_formula(3, 4, rng), random_formula(3, 4, rng))
+    for name in ('theorem_el', 'theorem_t1', 'theorem_t2'):
+        yield f"theorem/{name}", _parse(texts[0]), lambda F, th=getattr(theorems, name): th(0, F), 5
+    for name in ('theorem_t3', 'theorem_t4', 'theorem_t5', 'theorem_t6', 'theorem_t7'):
+        yield f"theorem/{name}", _parse(*texts), lambda FG, th=getattr(theorems, name): th(0, *FG), 5
+
+    formulas = [("chain-v1", implication_chain(1)), ("negation-d1", negation_tower(1))]
+    if not quick:
+        formulas += [("negation-d2", negation_tower(2)), ("chain-v2", implication_chain(2)),
+                     ("chain-v3", implication_chain(3)), ("chain-v4", implication_chain(4)),
+                     ("syllogism-v3", syllogism(3)), ("syllogism-v4", syllogism(4))]
+    for name, text in formulas:
+        yield f"adequacy/{name}", _parse(text), adequacy_theorem, 3
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    :param results: dict - case name -> measurements
+    :param baseline: dict - case name -> measurements
+    :param tolerance: float - allowed relative growth of time and memory
+    :return: list of strings - regressions found
+    """
+    regressions = []
+    for name, cur in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        if cur['time'] > old['time'] * (1 + tolerance) and cur['time'] - old['time'] > TIME_FLOOR:
+            regressions.append(f"{name}: time {old['time']:.4f}s -> {cur['time']:.4f}s")
+        if cur['peak'] > old['peak'] * (1 + tolerance):
+            regressions.append(f"{name}: peak memory {old['peak']} -> {cur['peak']} bytes")
+        if cur['length'] != old['length']:
+            regressions.append(f"{name}: proof length {old['length']} -> {cur['length']}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--baseline', default=BASELINE, help="baseline JSON file")
+    parser.add_argument('--update', action='store_true', help="store results as baseline instead of comparing")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="allowed relative growth")
+    parser.add_argument('--quick', action='store_true', help="small sizes only")
+    parser.add_argument('-k', dest='pattern', default='', help="run only cases whose name contains pattern")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, setup, fn, repeat in cases(args.quick):
+        if args.pattern not in name:
+            continue
+        results[name] = res = measure(setup, fn, repeat)
+        length = '' if res['length'] is None else f"{res['length']:>10} lines"
+        print(f"{name:<45} {res['time'] * 1000:>12.3f} ms {res['peak'] / 2 ** 20:>10.2f} MB {length}")
+
+    if args.update:
+        stored = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as fh:
+                stored = json.load(fh)['results']
+        stored.update(results)
+        with open(args.baseline, 'w') as fh:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(), 'results': stored},
+                      fh, indent=2, sort_keys=True)
+        print(f"baseline stored in {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, run with --update to create it")
+        return 0
+    with open(args.baseline) as fh:
+        regressions = compare(results, json.load(fh)['results'], args.tolerance)
+    for line in regressions:
+        print("REGRESSION", line)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -12,6 +12,8 @@ if __name__ == '__main__':
     p1 = FormulaParser(f2).parse()
     fs, anns, inc = adequacy_theorem(p1)
     # with open('output.txt', 'w') as f:   # formula f4 fully derived took 200k formulas and 500mb to be written in file
-    #     f.writelines(anns)
+    #     adequacy_theorem(FormulaParser(f4).parse(), sink=f)   # streamed line by line, nothing is collected
+    # with CompactWriter('output.txt.xz') as f:   # repeated sub-formulas abbreviated, compressed, see expand()
+    #     adequacy_theorem(FormulaParser(f4).parse(), sink=f)
     for an in anns:
         print(an, end='')
@@ -6,7 +6,14 @@ from propositional calculus. Also implemented few helper theorems.
 
 from .formula_parser import FormulaParser
 from .formula import Formula
-from .logic_inference import adequacy_theorem
+from .logic_inference import adequacy_theorem, adequacy_proof, iter_adequacy_proof
+from .proof import Annotation, Line, Proof, ProofFile, ProofSeq
+from .compact import CompactWriter, expand, iter_expanded
+from .checker import check_file, check_inference, check_proof
+from .profiling import Profiler
+from .theorems import clear_schema_cache
 
 
-__all__ = ['Formula', 'FormulaParser', 'adequacy_theorem']
+__all__ = ['Annotation', 'Formula', 'FormulaParser', 'Line', 'Proof', 'ProofFile', 'ProofSeq', 'adequacy_theorem',
+           'adequacy_proof', 'iter_adequacy_proof', 'check_file', 'check_inference', 'check_proof', 'CompactWriter',
+           'expand', 'iter_expanded', 'Profiler', 'clear_schema_cache']
@@ -0,0 +1,210 @@
+"""
+Independent proof checker.
+
+Every line has to be an instance of A1-A3, a declared hypothesis, or follow by MP from earlier lines. Annotations
+and line flags are not trusted - only formulas are looked at. MP is checked without searching for premises: once
+both A and A -> B are derived, B is put into the set of MP consequences, so every line costs O(1) hashed lookups
+plus its share of implications it unlocks, and the whole proof is checked in linear time.
+
+Checker works over any hashable formula keys given a `shape` function key -> (operation, left, right),
+which lets it check formula objects, compact Proof formula ids and proofs parsed from text alike.
+"""
+import re
+
+from .compact import iter_expanded, open_text
+from .formula_parser import FormulaParser
+
+
+# "F_12: <formula> - Hypothesis", "F_12: <formula> Axiom  A1 from previous inference" ...
+_LINE = re.compile(r"F_-?\d+: (.*?)(?: - | Axiom  A\d from previous inference$)")
+
+
+def _node_shape(F):
+    """
+    :param F: Formula
+    :return: tuple (operation, left, right) where operation in None (variable), 'NOT', 'IMP'
+    """
+    node = F.node
+    if node.operation == "IMP":
+        return "IMP", node.successors[0], node.successors[1]
+    if node.operation == "NOT":
+        return "NOT", node.successors[0], None
+    return None, None, None
+
+
+def _node_key(F):
+    return F.node
+
+
+class ProofChecker:
+    """
+    Incremental checker: lines are fed one by one with `add`
+    """
+
+    def __init__(self, hypothesis=(), shape=_node_shape, key=_node_key):
+        """
+        :param hypothesis: iterable - formulas allowed as hypotheses
+        :param shape: callable - formula key -> (operation, left key, right key)
+        :param key: callable - line formula -> hashable key, equal for structurally equal formulas
+        """
+        self.shape = shape
+        self.key = key
+        self.hypothesis = {key(h) for h in hypothesis}
+        self.derived = set()            # formulas of already checked lines
+        self.consequences = set()       # B such that A and A -> B are both derived
+        self.waiting = {}               # A -> list of B, for derived A -> B while A isn't derived yet
+        self.lines = 0
+
+    def axiom_num(self, x) -> int:
+        """
+        Recognizes axiom schema instance
+
+        :param x: formula key
+        :return: int - 1, 2 or 3 if x is instance of A1, A2 or A3, 0 otherwise
+        """
+        shape = self.shape
+        op, left, right = shape(x)
+        if op != "IMP":
+            return 0
+        r_op, r_left, r_right = shape(right)
+        if r_op != "IMP":
+            return 0
+        if r_right == left:                                 # F -> (G -> F)
+            return 1
+        l_op, l_left, l_right = shape(left)
+        rl_op, rl_left, rl_right = shape(r_left)
+        if l_op != "IMP" or rl_op != "IMP":
+            return 0
+        lr_op, lr_left, lr_right = shape(l_right)
+        rr_op, rr_left, rr_right = shape(r_right)
+        # (F -> (G -> H)) -> ((F -> G) -> (F -> H))
+        if lr_op == "IMP" and rr_op == "IMP" and l_left == rl_left == rr_left and lr_left == rl_right \
+                and lr_right == rr_right:
+            return 2
+        # (!G -> !F) -> ((!G -> F) -> G)
+        if l_left == rl_left and shape(l_left) == ("NOT", r_right, None) and shape(l_right) == ("NOT", rl_right, None):
+            return 3
+        return 0
+
+    def add(self, F) -> str:
+        """
+        Checks next line of proof
+
+        :param F: line formula
+        :return: str - how line is justified: 'A1', 'A2', 'A3', 'hypothesis' or 'MP'
+        """
+        x = self.key(F)
+        self.lines += 1
+        if x in self.consequences:
+            rule = 'MP'
+        elif x in self.hypothesis:
+            rule = 'hypothesis'
+        else:
+            num = self.axiom_num(x)
+            if not num:
+                raise ValueError(f"Line {self.lines} is neither axiom, hypothesis nor MP consequence: {F}")
+            rule = f'A{num}'
+        if x not in self.derived:
+            self.derived.add(x)
+            op, left, right = self.shape(x)
+            if op == "IMP":
+                if left in self.derived:
+                    self.consequences.add(right)
+                else:
+                    self.waiting.setdefault(left, []).append(right)
+            self.consequences.update(self.waiting.pop(x, ()))
+        return rule
+
+
+def check_inference(inference, hypothesis=()) -> int:
+    """
+    Checks inference sequence as produced by theorem functions
+
+    :param inference: iterable of Formula
+    :param hypothesis: iterable of Formula - hypotheses allowed in inference
+    :return: int - amount of checked lines, ValueError is raised at the first wrong one
+    """
+    checker = ProofChecker(hypothesis)
+    for f in inference:
+        checker.add(f)
+    return checker.lines
+
+
+def check_proof(proof, hypothesis=()) -> int:
+    """
+    Checks compact proof, working directly on its formula table
+
+    :param proof: Proof or ProofFile, left unchanged
+    :param hypothesis: iterable of Formula - hypotheses allowed in proof
+    :return: int - amount of checked lines, ValueError is raised at the first wrong one
+    """
+    ops, lefts, rights = proof.ops, proof.lefts, proof.rights
+    ids = proof.find_formulas(hypothesis)          # hypotheses missing in the table can't be used by proof anyway
+
+    def shape(i):
+        op = ops[i]
+        if op == 2:
+            return "IMP", lefts[i], rights[i]
+        if op == 1:
+            return "NOT", lefts[i], None
+        return None, None, None
+
+    checker = ProofChecker(ids, shape, int)
+    for fid in proof.formulas:
+        checker.add(fid)
+    return checker.lines
+
+
+def check_file(stream, hypothesis=()) -> int:
+    """
+    Checks proof written as annotations, one line at a time, so the file never has to fit in memory.
+    Only formula part of every annotation is read. Compact output is expanded on the fly, see compact module
+
+    :param stream: text stream or file path, '.gz', '.xz' and '.lzma' files are decompressed
+    :param hypothesis: iterable of Formula - hypotheses allowed in proof
+    :return: int - amount of checked lines, ValueError is raised at the first wrong one
+    """
+    if isinstance(stream, str):
+        with open_text(stream) as fh:
+            return check_file(fh, hypothesis)
+    checker = ProofChecker(hypothesis)
+    for text in iter_expanded(stream):
+        m = _LINE.match(text)
+        if m is None:
+            raise ValueError(f"Line {checker.lines + 1} is not an inference line: {text[:60]!r}")
+        checker.add(FormulaParser(m.group(1)).parse())
+    return checker.lines
+
+
+if __name__ == '__main__':
+    import io
+
+    from .formula import Formula
+    from .logic_inference import adequacy_theorem
+
+    def rejected(fn, *args) -> bool:
+        try:
+            fn(*args)
+        except ValueError:
+            return True
+        return False
+
+    F = Formula.var("F")
+    G = Formula.var("G")
+    a1 = F.imp(G.imp(F))                                                # F -> (G -> F)
+
+    assert check_inference([a1]) == 1
+    assert rejected(check_inference, [F.imp(G)])                        # neither axiom nor MP consequence
+    assert rejected(check_inference, [a1, G.imp(F)])                    # MP premise F was never derived
+    assert check_inference([F, a1, G.imp(F)], hypothesis=[F]) == 3
+
+    checker = ProofChecker()
+    assert checker.add(a1) == 'A1'
+    assert checker.axiom_num(G.neg().imp(F.neg()).imp(G.neg().imp(F).imp(G))) == 3
+    assert checker.axiom_num(G.neg().imp(F.neg()).imp(G.neg().imp(F).imp(F))) == 0       # A3 concludes G
+
+    H = Formula.var("f").imp(Formula.var("f").neg().neg())
+    out = io.StringIO()
+    amt = adequacy_theorem(H, sink=out)
+    assert check_file(io.StringIO(out.getvalue())) == amt
+    assert rejected(check_file, io.StringIO(out.getvalue().split("\n", 1)[1]))         # first line dropped
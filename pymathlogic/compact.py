@@ -0,0 +1,283 @@
+"""
+Compact textual proof output.
+
+Annotations of long inferences repeat the same huge sub-formulas over and over, so compact output defines every
+sub-formula longer than a threshold once, right before its first use, and refers to it by name afterwards:
+
+    let S1 := ((!(f)) -> ((f) -> (g)))
+    let S2 := (S1 -> ((!(f)) -> S1))
+    F_7: S2 - Axiom A1 applied to: F: S1, G: (!(f))
+
+Definitions are built from earlier names and short sub-formulas, so output grows with the amount of distinct
+sub-formulas instead of the total length of annotations. Names can't be confused with variables, which are always
+rendered as (name) and must be names the parser accepts. Expanding compact output gives back exactly the annotations
+it was written from:
+
+    with CompactWriter('f4.txt.xz') as out:             # '.gz', '.xz' and '.lzma' files are compressed on the fly
+        adequacy_theorem(F, sink=out)
+    expand('f4.txt.xz', 'f4.txt')                       # usual fully expanded annotations
+"""
+import gzip
+import lzma
+import os
+import re
+
+from .proof import (Annotation, HYPOTHESIS_ANNOTATION, AXIOM_ANNOTATIONS, AXIOM_COPY_ANNOTATION, MP_ANNOTATION,
+                    AXIOM, AXIOM_COPY, MP)
+
+
+MIN_LENGTH = 32             # sub-formulas rendered shorter than that are written inline
+_TEXT_CACHE_SIZE = 4096     # expanded definitions kept for reuse while expanding
+
+LET = "let S{name} := {formula}\n"
+_LET = re.compile(r"let S(\d+) := (.*)")
+_NAME = re.compile(r"S(\d+)")
+_NAME_ENDS = ('', ' ', ')', ',', '\n')   # what may follow a name: end of formula, list or line
+_VAR_NAME = re.compile(r"(?:[^\s()!-]|-(?!>))+")   # variable names the parser accepts, see formula_parser
+
+_OPENERS = {'.gz': gzip.open, '.xz': lzma.open, '.lzma': lzma.open}
+
+
+def open_text(path: str, mode: str = 'r'):
+    """
+    Opens text file for streaming read or write, '.gz' files through gzip and '.xz' / '.lzma' through lzma
+
+    :param path: str - file path
+    :param mode: str - 'r', 'w' or 'a'
+    :return: text stream
+    """
+    return _OPENERS.get(os.path.splitext(path)[1], open)(path, mode + 't')
+
+
+class CompactWriter:
+    """
+    Writes annotations in compact form, see module docstring. Accepted as sink by adequacy_theorem
+    """
+
+    __slots__ = ('_stream', '_owned', '_refs', '_names', 'min_length', 'lines')
+
+    def __init__(self, sink, min_length: int = MIN_LENGTH):
+        """
+        :param sink: text stream or file path, paths ending with '.gz', '.xz' or '.lzma' are compressed
+        :param min_length: int - sub-formulas rendered at least that long are defined as abbreviations
+        """
+        self._owned = isinstance(sink, str)
+        self._stream = open_text(sink, 'w') if self._owned else sink
+        self._refs = {}                     # formula node -> its name or inline text
+        self._names = 0                     # amount of defined abbreviations
+        self.min_length = min_length
+        self.lines = 0                      # amount of written annotations
+
+    def ref(self, F) -> str:
+        """
+        Reference to formula: its name or short text. Sub-formulas met for the first time are defined first,
+        sons before their parents
+
+        :param F: Formula or Line
+        :return: str
+        """
+        refs = self._refs
+        node = F.node
+        res = refs.get(node)
+        if res is not None:
+            return res
+        stack = [node]
+        while stack:
+            node = stack[-1]
+            if node in refs:
+                stack.pop()
+                continue
+            pending = [son for son in node.successors if son not in refs]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            if node.type == 'var':
+                if _VAR_NAME.fullmatch(node.name) is None:
+                    raise ValueError(f"Variable name {node.name!r} can't be written in compact form")
+                refs[node] = "({})".format(node.name)
+                continue
+            if node.operation == "NOT":
+                text = "(!{})".format(refs[node.successors[0]])
+            else:
+                text = "({} -> {})".format(refs[node.successors[0]], refs[node.successors[1]])
+            if len(text) >= self.min_length:
+                self._names += 1
+                self._stream.write(LET.format(name=self._names, formula=text))
+                text = "S{}".format(self._names)
+            refs[node] = text
+        return refs[F.node]
+
+    def add(self, annotation: Annotation):
+        """
+        Writes annotation, abbreviations it needs are defined before it
+
+        :param annotation: Annotation
+        :return: None
+        """
+        rule = annotation.rule
+        formula = self.ref(annotation.formula)
+        if rule == MP:
+            a, b = annotation.premises
+            text = MP_ANNOTATION.format(num=annotation.num, formula=formula, fNum=a, gNum=b)
+        elif rule == AXIOM:
+            operands = {name: self.ref(F) for name, F in zip('FGH', annotation.operands)}
+            text = AXIOM_ANNOTATIONS[annotation.axiom_num].format(num=annotation.num, formula=formula, **operands)
+        elif rule == AXIOM_COPY:
+            text = AXIOM_COPY_ANNOTATION.format(num=annotation.num, formula=formula, axiom_num=annotation.axiom_num)
+        else:
+            text = HYPOTHESIS_ANNOTATION.format(num=annotation.num, formula=formula)
+        self._stream.write(text)
+        self.lines += 1
+
+    def close(self):
+        """
+        Closes file opened by writer, streams given by caller are left open
+        """
+        if self._owned:
+            self._stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _split(text: str) -> list:
+    """
+    Splits compact text into pieces: plain text and abbreviation names. Name is a reference only where formula may
+    start - after '!', or after space or '(' (then it's left operand of implication) - and where formula may end,
+    so variables '(S1)', '(xS1)' and the like are never taken for names
+
+    :param text: str
+    :return: list of str and int
+    """
+    pieces = []
+    pos = 0
+    for m in _NAME.finditer(text):
+        start, end = m.span()
+        before = text[start - 1] if start else ' '
+        if before == '(':
+            if not text.startswith(' -> ', end):
+                continue
+        elif before not in ' !' or text[end:end + 1] not in _NAME_ENDS:
+            continue
+        if start > pos:
+            pieces.append(text[pos:start])
+        pieces.append(int(m.group(1)))
+        pos = end
+    if pos < len(text):
+        pieces.append(text[pos:])
+    return pieces
+
+
+class _Expander:
+    """
+    Abbreviations defined so far, kept compact: definitions are split into pieces and expanded on use
+    """
+
+    def __init__(self):
+        self.definitions = {}           # name -> pieces
+        self._texts = {}                # name -> expanded text, cache
+
+    def text(self, name: int) -> str:
+        """
+        :param name: int - abbreviation number
+        :return: str - expanded formula
+        """
+        texts = self._texts
+        res = texts.get(name)
+        if res is not None:
+            return res
+        out = []
+        stack = list(reversed(self.definitions[name]))
+        while stack:
+            item = stack.pop()
+            if type(item) is str:
+                out.append(item)
+            elif item in texts:
+                out.append(texts[item])
+            else:
+                stack.extend(reversed(self.definitions[item]))
+        if len(texts) >= _TEXT_CACHE_SIZE:
+            texts.clear()
+        res = texts[name] = ''.join(out)
+        return res
+
+    def line(self, text: str) -> str:
+        """
+        :param text: str - line of compact output
+        :return: str - expanded annotation, None for definition
+        """
+        m = _LET.match(text) if text.startswith('let ') else None
+        if m is not None:
+            self.definitions[int(m.group(1))] = _split(m.group(2))
+            return None
+        pieces = _split(text)
+        if len(pieces) == 1 and type(pieces[0]) is str:
+            return text
+        return ''.join(item if type(item) is str else self.text(item) for item in pieces)
+
+
+def iter_expanded(stream):
+    """
+    Expands compact output line by line, expanded annotations pass unchanged
+
+    :param stream: iterable of lines - text stream or file path, see open_text
+    :return: generator of annotation strings
+    """
+    if isinstance(stream, str):
+        with open_text(stream) as fh:
+            yield from iter_expanded(fh)
+        return
+    expander = _Expander()
+    for text in stream:
+        res = expander.line(text)
+        if res is not None:
+            yield res
+
+
+def expand(source, target) -> int:
+    """
+    Writes fully expanded annotations of compact output
+
+    :param source: text stream or file path, see open_text
+    :param target: text stream or file path, see open_text
+    :return: int - amount of written lines
+    """
+    if isinstance(target, str):
+        with open_text(target, 'w') as fh:
+            return expand(source, fh)
+    amt = 0
+    for text in iter_expanded(source):
+        target.write(text)
+        amt += 1
+    return amt
+
+
+if __name__ == '__main__':
+    import io
+
+    from .compact import CompactWriter, expand      # classes of the package module, not of __main__
+    from .formula import Formula
+    from .formula_parser import FormulaParser
+    from .logic_inference import adequacy_theorem
+
+    F = FormulaParser("((f) -> (!(!(f))))").parse()
+    plain = io.StringIO()
+    compact = io.StringIO()
+    amt = adequacy_theorem(F, sink=plain)
+    with CompactWriter(compact) as out:
+        adequacy_theorem(F, sink=out)
+    expanded = io.StringIO()
+    assert expand(io.StringIO(compact.getvalue()), expanded) == amt
+    assert expanded.getvalue() == plain.getvalue()
+    assert len(compact.getvalue()) < len(plain.getvalue())
+    assert _split("(S1 -> (xS1))") == ['(', 1, ' -> (xS1))']          # variables are never taken for names
+    try:                                                                # names with spaces would read as references
+        CompactWriter(io.StringIO()).ref(Formula.var("a S1"))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("variable name with space accepted")
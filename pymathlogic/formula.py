@@ -12,28 +12,109 @@ F, G formula => (F -> G) - formula
 (!((x1) -> (x2))) -- main operation 'negation'
 
 """
+import heapq
+import threading
+import weakref
+
+from .truth_table import compile_formula
+from .validity import find_counterexample
+
+
 imp = lambda a, b: int(not a or b)
 neg = lambda a: int(not a)
 
+# structural key -> shared formula node. Keys of compound formulas hold their (already interned) successors,
+# so one entry lives exactly as long as somebody references the node it maps to
+_interned = weakref.WeakValueDictionary()
+# bit in variable masks of formulas -> variable name, None for free bit. Every variable node owns its bit while
+# alive, freed bits are reused lowest first, so masks stay as wide as the amount of live variables
+_var_names = []
+_free_bits = []                 # heap of freed bits
+_intern_lock = threading.RLock()    # guards building of new nodes and variable table, reentered by _release_bit
+_STR_CACHE_SIZE = 128           # formulas of at most that many operations and variables keep their rendered string
+
+
+def _release_bit(bit: int):
+    """
+    Frees variable mask bit of dead variable node. May run in the middle of _intern when collecting garbage,
+    hence reentrant lock
+
+    :param bit: int
+    :return: None
+    """
+    with _intern_lock:
+        _var_names[bit] = None
+        heapq.heappush(_free_bits, bit)
+
 
 class FormulaBase:
     """
-    Base class for formula
+    Base class for formula. Formula keeps structure only, its place in an inference is kept by proof.Line
     """
 
-    __slots__ = ('str_val', 'operation', 'type', 'successors', 'is_complete', 'is_axiom', 'derived_by_mp_from', 'axiom_num', 'seq_num')
+    __slots__ = ('_str_val', 'operation', 'type', 'successors', 'name', '_hash', '_compiled',
+                 '_var_mask', '_depth', '_size', '_variables', '__weakref__')
 
-    def __init__(self, content):
-        self.str_val = content        # string representation of formula
-        self.is_complete = False      # is it totally packed?
-        # stuff for more convenient implementation of deduction theorem                            -----
-        self.is_axiom = False         # is it axiom                                                    |
-        self.axiom_num = None         # if it is, which form (A1-A3) it meets?                         |
-        self.seq_num = -1             # number in inference sequence                                   |
-        self.derived_by_mp_from = []  # if we got this formula using Modus Ponens - from which exactly--
+    def __init__(self, content=None):
+        self._str_val = content       # string representation of formula, rendered on first access if None
+        self.name = None              # variable name if formula is variable
+        self._compiled = None         # flattened instruction list, built on first evaluation
+        # structural hash and metadata (_hash, _var_mask, _depth, _size, _variables) are set by interning factories
         self.operation = None         # 'IMP' 'NOT' - main operation
         self.type = None              # var/formula
-        self.successors = []          # sub-formulas
+        self.successors = ()          # sub-formulas
+
+    @property
+    def node(self):
+        """
+        Shared (interned) node of formula - formula itself, as every formula is built by interning factories.
+        Lets formulas and proof lines be passed interchangeably
+
+        :return: Formula
+        """
+        return self
+
+    @property
+    def str_val(self):
+        """
+        String representation of formula, rendered from the tree on access, so structural operations never pay
+        for it. Only strings of small formulas are cached on the node: long ones are rendered for output and would
+        otherwise stay in memory as long as their nodes, which is most of the memory of streamed inference
+
+        :return: str
+        """
+        res = self._str_val
+        if res is None:
+            res = self._render()
+            if self._size <= _STR_CACHE_SIZE:
+                self._str_val = res
+        return res
+
+    def _render(self):
+        """
+        Renders formula tree into string, small sub-formulas are rendered once and cached, so big formulas are walked
+        down to them only
+
+        :return: str
+        """
+        pieces = []
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if type(item) is str:
+                pieces.append(item)
+            elif item._str_val is not None:
+                pieces.append(item._str_val)
+            elif item is not self and item._size <= _STR_CACHE_SIZE:
+                pieces.append(item.str_val)
+            elif item.operation == "IMP":
+                left, right = item.successors
+                stack.extend((')', right, ' -> ', left, '('))
+            elif item.operation == "NOT":
+                stack.extend((')', item.successors[0], '(!'))
+            else:
+                pieces.append("({})".format(item.name))
+        return ''.join(pieces)
 
     def __str__(self):
         return self.str_val
@@ -48,18 +129,55 @@ class FormulaBase:
         :return: str
         """
         if self.type == 'var':
-            return self.str_val[1:-1]
+            return self.name
         else:
             return ''
 
-    def set_type(self, type: str):
-        self.type = type
+    @property
+    def var_mask(self) -> int:
+        """
+        Variables of formula as bitmask over variable table, computed when formula is built. Bits are owned by live
+        variable nodes, so masks of formulas alive at the same time are comparable
 
-    def set_operation(self, operation: str):
-        self.operation = operation
+        :return: int
+        """
+        return self.node._var_mask
+
+    @property
+    def depth(self) -> int:
+        """
+        Nesting depth of formula, 0 for variable
 
-    def add_successor(self, f):
-        self.successors.append(f)
+        :return: int
+        """
+        return self.node._depth
+
+    @property
+    def size(self) -> int:
+        """
+        Amount of operations and variables in formula written as tree
+
+        :return: int
+        """
+        return self.node._size
+
+    @property
+    def variables(self) -> tuple:
+        """
+        Variable names of formula in variable table order, decoded from variable mask once per shared node
+
+        :return: tuple of str
+        """
+        node = self.node
+        if node._variables is None:
+            names = []
+            mask = node._var_mask
+            while mask:
+                low = mask & -mask
+                names.append(_var_names[low.bit_length() - 1])
+                mask ^= low
+            node._variables = tuple(names)
+        return node._variables
 
     def get_vars(self)-> set:
         """
@@ -67,57 +185,120 @@ class FormulaBase:
 
         :return:
         """
-        if self.type == "var":
-            return {self.str_val[1:-1],  }
-        else:
-            if self.operation == "IMP":
-                left, right = self.successors
-                lVars = left.get_vars()
-                rVars = right.get_vars()
-                return lVars.union(rVars)
-            elif self.operation == "NOT":
-                return self.successors[0].get_vars()
+        return set(self.variables)
 
     def get_vars_as_formulas(self):
         """
         Collect a set of all variables present in formula and recast them
         to formulas
 
-        :return:
+        :return: list of Formula
+        """
+        return [Formula.var(var) for var in self.get_vars()]
+
+    def compile(self):
+        """
+        Flattened post-order instruction list of formula, built once per shared node
+
+        :return: CompiledFormula
+        """
+        node = self.node
+        if node._compiled is None:
+            node._compiled = compile_formula(node)
+        return node._compiled
+
+    def evaluate_many(self, vectors) -> list:
+        """
+        Evaluates formula on a batch of boolean vectors at once
+
+        :param vectors: iterable of dicts - {'var_name': value} where value in {0; 1}
+        :return: list of int 0/1, one per vector
         """
-        data = self.get_vars()
-        hyp = []
-        temp = "({})"
-        for i, var in enumerate(data):
-            f = Formula(temp.format(var))
-            f.is_complete = True
-            f.type = 'var'
-            f.seq_num = i + 1
-            hyp.append(f)
-        return hyp
+        return self.compile().evaluate_many(vectors)
 
     def __call__(self, **kwargs):
-        if self.type == 'var':
-            vName = self.get_var_name()
-            assert vName, 'incorrect value'
-            return kwargs[vName]
-        else:
-            if self.operation == "NOT":
-                son = self.successors[0]
-                return neg(son(**kwargs))
-            elif self.operation == "IMP":
-                left, right = self.successors
-                return imp(left(**kwargs), right(**kwargs))
+        return self.compile().evaluate(kwargs)
 
     def __eq__(self, other):
-        if isinstance(other, Formula):
-            return self.str_val == other.str_val
+        if isinstance(other, FormulaBase):
+            return self is other
+        return NotImplemented
+
+    def __hash__(self):
+        return self._hash
 
 
 class Formula(FormulaBase):
+    """
+    Formulas are built by the interning factories `var`, `imp` and `neg`, which return one shared
+    node per structurally distinct formula, so equality is an identity check and hashing is O(1).
+    Nodes are immutable once built (only lazily computed caches are filled later), so sub-formulas are shared
+    by any amount of proofs and threads without copying
+    """
+
+    __slots__ = ()
+
+    def __init__(self, content=None):
+        raise TypeError("Formula can't be constructed directly, use Formula.var, imp, neg or FormulaParser")
+
+    @classmethod
+    def _intern(cls, key, operation, successors, name=None):
+        """
+        Returns shared node for given structural key, building it on first request. Building is done under lock,
+        so threads asking for the same new formula get the same node
+
+        :param key: tuple - structural key: operation and interned successors
+        :param operation: str - 'IMP' 'NOT' or None for variable
+        :param successors: tuple - interned sub-formulas
+        :param name: str - variable name, for variables only
+        :return: Formula
+        """
+        node = _interned.get(key)
+        if node is not None:
+            return node
+        with _intern_lock:
+            node = _interned.get(key)
+            if node is not None:
+                return node
+            node = cls.__new__(cls)
+            FormulaBase.__init__(node)
+            node.name = name
+            node.operation = operation
+            node.successors = successors
+            node.type = "formula" if successors else "var"
+            node._hash = hash(key)                              # structural: successors hash by their own keys
+            node._variables = None
+            if name is not None:
+                if _free_bits:
+                    bit = heapq.heappop(_free_bits)
+                    _var_names[bit] = name
+                else:
+                    bit = len(_var_names)
+                    _var_names.append(name)
+                weakref.finalize(node, _release_bit, bit).atexit = False
+                node._var_mask = 1 << bit
+                node._depth = 0
+                node._size = 1
+            else:
+                node._var_mask = 0
+                node._depth = 0
+                node._size = 1
+                for son in successors:
+                    node._var_mask |= son._var_mask
+                    node._depth = max(node._depth, son._depth + 1)
+                    node._size += son._size
+            _interned[key] = node
+        return node
+
+    @classmethod
+    def var(cls, name: str):
+        """
+        Builds (name) variable formula
 
-    def __init__(self, content):
-        super().__init__(content)
+        :param name: str - variable name
+        :return: Formula
+        """
+        return cls._intern(("VAR", name), None, (), name)
 
     def imp(self, f):
         """
@@ -126,13 +307,8 @@ class Formula(FormulaBase):
         :param f: Formula
         :return: Formula
         """
-        content = "({} -> {})".format(self.str_val, f.str_val)
-        new = Formula(content)
-        new.operation = "IMP"
-        new.successors = [self, f]
-        new.type = "formula"
-        new.is_complete = True
-        return new
+        left, right = self.node, f.node
+        return Formula._intern(("IMP", left, right), "IMP", (left, right))
 
     def neg(self):
         """
@@ -140,32 +316,38 @@ class Formula(FormulaBase):
 
         :return:
         """
-        content = "(!{})".format(self.str_val)
-        new = Formula(content)
-        new.operation = "NOT"
-        new.successors = [self]
-        new.type = "formula"
-        new.is_complete = True
-        return new
+        son = self.node
+        return Formula._intern(("NOT", son), "NOT", (son, ))
 
-    @classmethod
-    def copy(cls, F):
-        """
-        Copy constructor
-
-        :param F: Formula
-        :return: Formula object with all field copied
-        """
-        res = cls(F.str_val)
-        res.is_complete = F.is_complete
-        res.is_axiom = F.is_axiom
-        res.axiom_num = F.axiom_num
-        res.seq_num = F.seq_num
-        res.derived_by_mp_from = F.derived_by_mp_from[:]
-        res.operation = F.operation
-        res.type = F.type
-        res.successors = F.successors[:]
-        return res
+    def substitute(self, mapping: dict, memo: dict = None):
+        """
+        Replaces variables of formula with formulas, without recursion
+
+        :param mapping: dict - {variable formula: formula to put instead}
+        :param memo: dict - already substituted sub-formulas, shared between calls with the same mapping
+        :return: Formula
+        """
+        if memo is None:
+            memo = {}
+        stack = [self.node]
+        while stack:
+            node = stack[-1]
+            if node in memo:
+                stack.pop()
+            elif node.type == 'var':
+                memo[node] = mapping[node].node if node in mapping else node
+                stack.pop()
+            else:
+                pending = [son for son in node.successors if son not in memo]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                stack.pop()
+                if node.operation == "NOT":
+                    memo[node] = memo[node.successors[0]].neg()
+                else:
+                    memo[node] = memo[node.successors[0]].imp(memo[node.successors[1]])
+        return memo[self.node]
 
     def pow_alpha(self, vector):
         if self(**vector):
@@ -173,13 +355,14 @@ class Formula(FormulaBase):
         else:
             return self.neg()
 
-    def is_tautology(self):
-        var = tuple(sorted(self.get_vars()))
-        amt = len(var)
-        for mask in range(1 << amt):
-            strMask = '{0:0>{1}}'.format(bin(mask)[2:], amt)
-            intMask = map(int, strMask)
-            state = dict(zip(var, intMask))
-            if not self(**state):
-                return False
-        return True
+    def counterexample(self, backend: str = 'truth_table'):
+        """
+        Searches for a boolean vector on which formula is false
+
+        :param backend: str - validity backend: 'truth_table', 'bdd', 'dpll', 'gray' or registered one
+        :return: dict - {'var_name': value} falsifying formula, None if formula is a tautology
+        """
+        return find_counterexample(self, backend)
+
+    def is_tautology(self, backend: str = 'truth_table'):
+        return self.counterexample(backend) is None
@@ -2,44 +2,35 @@ from .formula import Formula
 import re
 
 
+# one token per match, leading spaces skipped; anything else is reported as an unexpected character
+_TOKEN = re.compile(r"\s*(?:(?P<LP>\()|(?P<RP>\))|(?P<IMP>->)|(?P<NOT>!)|(?P<NAME>(?:[^\s()!-]|-(?!>))+)|(?P<ERR>\S))")
+
+
 class FormulaParser:
+    """
+    Single pass parser: tokens are (kind, start, end) offsets into the input buffer and formula tree is
+    reduced bottom-up on an explicit stack of open parentheses, so parsing takes linear time and
+    no recursion regardless of nesting depth
+    """
 
     def __init__(self, string):
         self.root = None
         self._raw = string
-        self._remove_extra_spaces()
 
-    def _remove_extra_spaces(self):
-        self._raw = self._raw.strip()           # extra spaces before-after
-        p1 = ' +'
-        p2 = '\( +'
-        p3 = ' +\)'
-        self._raw = re.sub(p1, ' ', self._raw)  # multiple spaces in a row -> one space
-        self._raw = re.sub(p2, '(', self._raw)  # spaces between parentheses - remove at all
-        self._raw = re.sub(p3, ')', self._raw)
-
-    def _find_main_operation(self, string):
+    def _tokenize(self):
         """
-        Helper function for main operation token search in string
+        Splits input buffer into tokens
 
-        :param string: raw string
-        :return: None
+        :return: generator of tuples (kind, start, end) where kind in 'LP' 'RP' 'IMP' 'NOT' 'NAME'
         """
-        layer = 0
-        for i in range(len(string)):  # skip 1st open bracket
-            if string[i] == '(':
-                layer += 1
-            elif string[i] == ')':
-                layer -= 1
-            if i > 0 and layer == 1:
-                j1 = string.find("->", i, i + 4)    # spaces before-after operator is to be considered
-                j2 = string.find("!", i, i + 3)
-                if j1 == -1 and j2 == -1:
-                    return i, None                  # it is a simple variable
-                if j1 != -1:
-                    return j1, "IMP"
-                if j2 != -1:
-                    return j2, "NOT"
+        for m in _TOKEN.finditer(self._raw):
+            kind = m.lastgroup
+            if kind == 'ERR':
+                self._error("Unexpected character", m.start(kind))
+            yield kind, m.start(kind), m.end(kind)
+
+    def _error(self, message, pos):
+        raise ValueError(f"{message} at position {pos}: {self._raw[pos:pos + 20]!r}")
 
     def parse(self):
         """
@@ -47,46 +38,61 @@ class FormulaParser:
 
         :return: parser formula object
         """
-        cur = Formula(self._raw)
-        self.root = cur
-        self._parse(cur)
-        self.root.is_complete = True
+        self.root = self._parse()
         return self.root
 
-    def _parse(self, cur_formula):
+    def _parse(self):
         """
-        Parser helper method
+        Parser helper method. Every open parenthesis pushes a frame [operation, left, right] which is
+        filled by tokens inside and reduced into a formula on the matching close parenthesis
 
-        :param cur_formula: current formula object
-        :return: None
+        :return: Formula
         """
-        i, token = self._find_main_operation(cur_formula.str_val)
-        if token is None:                   # formula is a variable (base case)
-            cur_formula.set_type("var")
-            return
-        elif token == "IMP":
-            cur_formula.set_type("formula")
-            cur_formula.set_operation("IMP")
-            left_str_val = cur_formula.str_val[1:i - 1]           # avoid start '('
-            # avoid inconsistency in spaces before and after operation
-            right_start = cur_formula.str_val.find("(", i + 1)
-            right_str_val = cur_formula.str_val[right_start:-1]     # avoid end ')'
-            left_form = Formula(left_str_val)
-            right_form = Formula(right_str_val)
-            cur_formula.add_successor(left_form)
-            cur_formula.add_successor(right_form)
-            self._parse(left_form)
-            self._parse(right_form)
-            return
-        elif token == "NOT":
-            cur_formula.set_type("formula")
-            cur_formula.set_operation("NOT")
-            right_start = cur_formula.str_val.find("(", i + 1)
-            right_str_val = cur_formula.str_val[right_start:-1]
-            right_form = Formula(right_str_val)
-            cur_formula.add_successor(right_form)
-            self._parse(right_form)
-            return
+        stack = []
+        root = None
+        for kind, start, end in self._tokenize():
+            if root is not None:
+                self._error("Unexpected token after formula end", start)
+            if kind == 'LP':
+                if stack:
+                    operation, left, right = stack[-1]
+                    if not (operation is None and left is None or operation == 'NOT' and left is None
+                            or operation == 'IMP' and right is None):
+                        self._error("Operation expected", start)
+                stack.append([None, None, None])
+                continue
+            if not stack:
+                self._error("Formula is supposed to be wrapped in a parentheses", start)
+            frame = stack[-1]
+            operation, left, right = frame
+            if kind == 'NAME' and operation is None and left is None:
+                frame[0], frame[1] = 'VAR', self._raw[start:end]
+            elif kind == 'NOT' and operation is None and left is None:
+                frame[0] = 'NOT'
+            elif kind == 'IMP' and operation is None and left is not None:
+                frame[0] = 'IMP'
+            elif kind == 'RP' and (operation == 'VAR' or operation == 'NOT' and left is not None
+                                   or operation == 'IMP' and right is not None):
+                stack.pop()
+                if operation == 'VAR':
+                    formula = Formula.var(left)
+                elif operation == 'NOT':
+                    formula = left.neg()
+                else:
+                    formula = left.imp(right)
+                if not stack:
+                    root = formula
+                    continue
+                parent = stack[-1]                  # awaiting operand, ensured on its open parenthesis
+                if parent[0] == 'IMP':
+                    parent[2] = formula
+                else:
+                    parent[1] = formula
+            else:
+                self._error("Unexpected token", start)
+        if root is None:
+            self._error("Unexpected end of formula", len(self._raw))
+        return root
 
 
 if __name__ == '__main__':
@@ -100,6 +106,12 @@ if __name__ == '__main__':
     # f2 = "(((F) IMP ((G) IMP (H)) IMP (((F) IMP (G)) IMP ((F) IMP (H))))"
     p = FormulaParser(f1).parse()
     print(p.is_tautology())
+    for broken in ("(x", "(x y)", "((x) -> (y)", "(x) -> (y))"):
+        try:
+            FormulaParser(broken).parse()
+        except ValueError:
+            continue
+        raise AssertionError(f"{broken} is not a formula")
     # p = parse_formula("((((NOT (x2)) IMP (x3)) IMP (x1)) IMP ((x1) IMP (x1)))").parse()
     # vals = {'x1': 1, 'x2': 1, 'x3': 0}
     # print(p.get_vars())
@@ -1,249 +1,618 @@
 """
 
 """
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import time
+
 from .formula import Formula
+from .proof import Annotation, Line, Proof, ProofSeq
+from .compact import CompactWriter
 from .theorems import *
+from . import profiling
+
+
+_KALMAR_MEMO_LINES = 65536      # lines of sub-formula derivations kept by Kalmar memo for later leaves
+_leaf_memos = {}                # formula -> (Kalmar memo, evaluator) in pool worker, only for the last proved formula
+
+_ENTER = 0                      # Kalmar stack actions: derive formula,
+_COMBINE = 1                    # derive compound formula from its derived sub-formulas,
+_STORE = 2                      # memorize lines derived for formula
+
+_SPLIT = 0                      # adequacy stack actions: derive vector, splitting it if it doesn't decide formula,
+_UNION = 1                      # join derivations of both halves of split vector
+
+
+class _KalmarMemo:
+    """
+    Sub-formula derivations shared between Kalmar leaves, see _kalmar_helper. Memo is bounded by total amount of
+    lines of kept derivations, least recently used ones are dropped first and derived again if met later
+    """
+
+    __slots__ = ('_items', '_lines', 'max_lines')
+
+    def __init__(self, max_lines: int = _KALMAR_MEMO_LINES):
+        self._items = OrderedDict()         # (formula, its variables values) -> ProofSeq, least recent first
+        self._lines = 0                     # total amount of lines in _items
+        self.max_lines = max_lines
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        seq = self._items.get(key)
+        if seq is not None:
+            self._items.move_to_end(key)
+        return seq
+
+    def __setitem__(self, key, seq: ProofSeq):
+        items = self._items
+        old = items.pop(key, None)
+        if old is not None:
+            self._lines -= len(old)
+        items[key] = seq
+        self._lines += len(seq)
+        while self._lines > self.max_lines and len(items) > 1:
+            self._lines -= len(items.popitem(last=False)[1])
 
 
 def _build_hypothesis(F: Formula, vector: dict) -> tuple:
     """
-    Helper function for kalmar theorem. Implements xi^(alpha_i) hypothesis sequence
+    Helper function for kalmar theorem. Implements xi^(alpha_i) hypothesis sequence, unassigned variables are skipped
 
     :param F: Formula
-    :param vector: dict - boolean vector represented as {'var_name': value} where value in {0; 1}
+    :param vector: dict - boolean vector represented as {'var_name': value} where value in {0; 1; None}
     :return: tuple xi^(alpha_i)
     """
-    var_names = F.get_vars()
-    assert var_names == set(vector.keys()), 'Incorrect input vector for given formula'
+    var_names = F.variables
+    assert vector.keys() == set(var_names), 'Incorrect input vector for given formula'
     hyp = []
-    temp = "({})"
-    for i, var in enumerate(var_names):
-        f = Formula(temp.format(var))
-        f.is_complete = True
-        f.type = 'var'
-        if f(**vector) == 0:
-            f = f.neg()
-        f.seq_num = i + 1
-        hyp.append(f)
+    for var in var_names:
+        if vector[var] is None:
+            continue
+        f = Formula.var(var)
+        hyp.append(f.neg() if vector[var] == 0 else f)
     return tuple(hyp)
 
 
-def _get_formula_from(F: Formula, inf_list: list):
+def _kalmar_helper(F: Formula, hypothesis: tuple, vector: dict, memo: dict = None, values=None) -> ProofSeq:
     """
-    helper function to search through inference list for a given formula and
-    to retrieve it back
+    Helper function for Kalmar theorem. Sub-formulas are derived in post-order on an explicit stack, so formula depth
+    isn't limited by recursion limit. Every sub-formula derivation is a ProofSeq of its sons' derivations followed by
+    lines deriving the sub-formula itself. Derivation of F^alpha depends only on values of F's own variables,
+    so with memo given it's derived once per such restricted vector and later the very same sequence is reused
+
+    :param F: formula - current formula
+    :param hypothesis: tuple - logical inference hypothesis
+    :param vector:  dict - given boolean vector
+    :param memo: dict or _KalmarMemo - (formula, its variables values) -> derivation sequence, shared between
+                 vectors
+    :param values: IncrementalEvaluator or PartialValues - values of F's sub-formulas on vector, evaluated here
+                   if not given. Sub-formulas left undecided by partial vector are not derived
+    :return: ProofSeq - derivation of F^alpha
+    """
+    if values is None:
+        values = _vector_values(F, vector)
+    stack = [(_ENTER, F, None)]
+    blocks = []                                 # derivations of visited sub-formulas not combined yet
+    while stack:
+        action, G, arg = stack.pop()
+        if action == _COMBINE:
+            seq = ProofSeq()
+            results = []                        # per son: (derived line, its position in seq), None if not derived
+            sons = blocks[len(blocks) - sum(arg):]
+            del blocks[len(blocks) - len(sons):]
+            sons = iter(sons)
+            for derived in arg:
+                if derived:
+                    block = next(sons)
+                    seq = seq + block
+                    results.append((block.last, len(seq)))
+                else:
+                    results.append(None)
+            blocks.append(_kalmar_combine(G, seq, results, values))
+            continue
+        if action == _STORE:
+            memo[arg] = blocks[-1]
+            continue
+        # formula of all variables is met once per vector
+        if memo is not None and G.type != "var" and not (len(G.variables) == len(vector) or G in hypothesis):
+            key = (G.node, tuple(vector[v] for v in G.variables))
+            block = memo.get(key)
+            if profiling.active is not None:
+                profiling.active.count('kalmar/memo_misses' if block is None else 'kalmar/memo_hits')
+            if block is not None:
+                blocks.append(block)
+                continue
+            stack.append((_STORE, G, key))
+        if G in hypothesis or G.type == "var":
+            blocks.append(_kalmar_base(G, hypothesis, values))
+        else:
+            derived = [values.value(son) is not None for son in G.successors]
+            stack.append((_COMBINE, G, derived))
+            stack.extend((_ENTER, son, None) for son, d in zip(reversed(G.successors), reversed(derived)) if d)
+    return blocks[-1]
+
+
+def _vector_values(F: Formula, vector: dict):
+    """
+    Values of F's sub-formulas on vector
 
     :param F: Formula
-    :param inf_list: list - inference list
-    :return: Formula object/None
+    :param vector: dict - boolean vector, None for unassigned variables
+    :return: PartialValues if some variable is unassigned, IncrementalEvaluator otherwise
     """
-    for g in inf_list:
-        if F == g:
-            return g
-    return None
+    if None in vector.values():
+        return F.compile().partial_values(vector)
+    return F.compile().evaluator(vector)
 
 
-def _kalmar_helper(F: Formula, hypothesis: tuple, inf_list: list, ann_list: list, vector: dict, num: int):
+def _decided(F: Formula, vector: dict) -> bool:
+    """
+    :param F: Formula
+    :param vector: dict - boolean vector, None for unassigned variables
+    :return: bool - partial vector decides F, so F^alpha can be derived from assigned variables alone
     """
-    Recursive helper function for Kalmar theorem
+    return F.compile().partial_values(vector).result is not None
 
-    :param F: formula - current formula
-    :param hypothesis: tuple - logical inference hypothesis
-    :param inf_list: list - global inference list
-    :param ann_list: list - global inference list annotation
-    :param vector:  dict - given boolean vector
-    :return: None
+
+def _leaf_vectors(F: Formula, variables: tuple):
     """
-    if F in hypothesis:
-        index = 1 if not inf_list else inf_list[-1].seq_num + 1
-        f, ann = from_hypothesis(index, F)
-        inf_list.append(f)
-        ann_list.append(ann)
-        return
-    if F.type == "var":
-        if inf_list:
-            f, ann = from_hypothesis(inf_list[-1].seq_num + 1, F.pow_alpha(vector))
-        else:
-            f, ann = from_hypothesis(num + 1, F.pow_alpha(vector))
-        inf_list.append(f)
-        ann_list.append(ann)
-        return
-    else:
-        op = F.operation
-        if op == "NOT":
-            # if F(**vector) == 1:
-                # by induction assumption already derived
-            G = F.successors[0]
-            _kalmar_helper(G, hypothesis, inf_list, ann_list, vector, num)
-            if F(**vector) == 0:
-                f1s, ann1s, inc = theorem_t2(inf_list[-1].seq_num, G)            # G -> !!G
-                f1 = f1s[-1]
-                f2 = _get_formula_from(G, inf_list)                              # G
-                f3, ann3 = MP(f1.seq_num + 1, f2, f1)                            # !!G
-                fs = list(f1s) + [f3]
-                anns = ann1s + [ann3]
-                inf_list.extend(fs)
-                ann_list.extend(anns)
-                return
-        elif op == "IMP":
-            G, H = F.successors                                                  # F = G -> H
-            _kalmar_helper(G, hypothesis, inf_list, ann_list, vector, num)
-            _kalmar_helper(H, hypothesis, inf_list, ann_list, vector, num)
-            if G(**vector) == 0:
-                f1s, ann1s, inc = theorem_t3(inf_list[-1].seq_num, G, H)         # !G -> (G - > H)
-                f1 = f1s[-1]
-                f2 = _get_formula_from(G.neg(), inf_list)                        # ... |- !G
-                f3, ann3 = MP(f1.seq_num + 1, f2, f1)                            # ... |- (G -> H)
-                fs = list(f1s) + [f3]
-                anns = list(ann1s) + [ann3]
-                inf_list.extend(fs)
-                ann_list.extend(anns)
-                return
-            elif H(**vector) == 1:
-                f1, ann1 = axiom_A1(inf_list[-1].seq_num + 1, H, G)              # H -> (G -> H)
-                f2 = _get_formula_from(H.pow_alpha(vector), inf_list)            # ... |- H
-                f3, ann3 = MP(f1.seq_num + 1, f2, f1)                            # (G -> H)
-                fs = [f1, f3]
-                anns = [ann1, ann3]
-                inf_list.extend(fs)
-                ann_list.extend(anns)
-                return
-            elif G(**vector) == 1 and H(**vector) == 0:
-                f1 = _get_formula_from(G.pow_alpha(vector), inf_list)            # ... |- G
-                f2 = _get_formula_from(H.pow_alpha(vector), inf_list)            # ... |- !H
-                f3s, ann3s, inc = theorem_t6(inf_list[-1].seq_num, G, H)         # G -> (!H -> !(G -> H))
-                f3, ann3 = f3s[-1], ann3s[-1]
-                f4, ann4 = MP(f3.seq_num + 1, f1, f3)                            # !H -> !(G -> H)
-                f5, ann5 = MP(f4.seq_num + 1, f2, f4)                            # !(g -> h)
-                fs = list(f3s) + [f4, f5]
-                anns = list(ann3s) + [ann4, ann5]
-                inf_list.extend(fs)
-                ann_list.extend(anns)
-                return
-
-
-def kalmar_theorem(num: int, F: Formula, vector: dict):
+    Vectors adequacy recursion stops at, in the order it reaches them: variables are assigned one by one,
+    0 before 1, until assigned ones decide F
+
+    :param F: Formula
+    :param variables: tuple - sorted variable names of F
+    :return: generator of dicts, None for variables left unassigned
+    """
+    stack = [{v: None for v in variables}]
+    while stack:
+        vector = stack.pop()
+        if _decided(F, vector):
+            yield vector
+            continue
+        xi = next(v for v in variables if vector[v] is None)
+        stack.append({**vector, xi: 1})
+        stack.append({**vector, xi: 0})
+
+
+def _pow_alpha(F: Formula, values) -> Formula:
+    """
+    F^alpha: F if it's true on current vector, !F otherwise
+
+    :param F: Formula - sub-formula of evaluated formula
+    :param values: IncrementalEvaluator
+    :return: Formula
+    """
+    return F if values.value(F) else F.neg()
+
+
+def _kalmar_base(F: Formula, hypothesis: tuple, values) -> ProofSeq:
+    """
+    Derives F^alpha of hypothesis or variable F, see _kalmar_helper
+
+    :return: ProofSeq
+    """
+    f, ann = from_hypothesis(1, F if F in hypothesis else _pow_alpha(F, values))
+    return ProofSeq([f], [ann])
+
+
+def _append_mp(seq: ProofSeq, a: tuple, ab: tuple) -> tuple:
+    """
+    Appends MP line to sequence
+
+    :param seq: ProofSeq
+    :param a: tuple - line A and its position in seq
+    :param ab: tuple - line A -> B and its position in seq
+    :return: tuple (ProofSeq, (line B, its position))
+    """
+    pos = len(seq) + 1
+    f, ann = MP(1, a[0], ab[0], (a[1] - pos + 1, ab[1] - pos + 1))
+    return seq + ProofSeq([f], [ann]), (f, pos)
+
+
+def _kalmar_combine(F: Formula, seq: ProofSeq, results: list, values) -> ProofSeq:
+    """
+    Derives F^alpha of compound F once its sub-formulas are derived, see _kalmar_helper.
+    Values of sub-formulas are read from evaluator
+
+    :param F: Formula
+    :param seq: ProofSeq - derivations of F's sons
+    :param results: list - per son: (derived line, its position in seq), None if son isn't derived
+    :param values: IncrementalEvaluator or PartialValues
+    :return: ProofSeq - seq followed by derivation of F^alpha
+    """
+    op = F.operation
+    if op == "NOT":
+        # if F(**vector) == 1:
+            # by induction assumption already derived
+        G = F.successors[0]
+        if values.value(F) == 0:
+            t2 = theorem_seq(theorem_t2, G)                                     # G -> !!G
+            seq = seq + t2
+            seq, res = _append_mp(seq, results[0], (t2.last, len(seq)))         # !!G
+    elif op == "IMP":
+        G, H = F.successors                                                     # F = G -> H
+        if values.value(G) == 0:
+            t3 = theorem_seq(theorem_t3, G, H)                                  # !G -> (G - > H)
+            seq = seq + t3
+            seq, res = _append_mp(seq, results[0], (t3.last, len(seq)))         # ... |- (G -> H)
+        elif values.value(H) == 1:
+            f1, ann1 = axiom_A1(1, H, G)                                        # H -> (G -> H)
+            seq = seq + ProofSeq([f1], [ann1])
+            seq, res = _append_mp(seq, results[1], (f1, len(seq)))              # (G -> H)
+        elif values.value(G) == 1 and values.value(H) == 0:
+            t6 = theorem_seq(theorem_t6, G, H)                                  # G -> (!H -> !(G -> H))
+            seq = seq + t6
+            seq, res = _append_mp(seq, results[0], (t6.last, len(seq)))         # !H -> !(G -> H)
+            seq, res = _append_mp(seq, results[1], res)                         # !(g -> h)
+    return seq
+
+
+def kalmar_theorem(num: int, F: Formula, vector: dict, memo: dict = None):
     """
     Kalmar theorem implementation
 
     :param num:     int - last used index in inference sequence
     :param F:       Formula - formula - F to be derived
-    :param vector:  dict - boolean vector represented as {'var_name': value} where value in {0; 1}
+    :param vector:  dict - boolean vector represented as {'var_name': value} where value in {0; 1}. Value may be
+                    None if assigned variables already decide F, then F^alpha is derived from them only
+    :param memo:    dict - if given, derivations of sub-formulas are saved into it and reused by later calls
+                    on other vectors
     :return:        logical inference of formula F from it's variables xi^(alpha_i)
                     where xi^(alpha_i) = xi if alpha_i = 1 else !xi
     """
-    print(f'Kalmar called on vector: {tuple(vector.values())}')
+    inf_list, ann_list = _kalmar_inference(F, vector, memo).to_lists(num)
+    return inf_list, ann_list, len(ann_list)
+
+
+def _kalmar_inference(F: Formula, vector: dict, memo: dict = None, values=None) -> ProofSeq:
+    """
+    Kalmar theorem inference, see kalmar_theorem and _kalmar_helper. Evaluator, if given, is moved to full vector,
+    so evaluator shared by consecutive vectors re-evaluates only sub-formulas of changed variables
+
+    :return: ProofSeq numbered from 1
+    """
+    prof = profiling.active
+    if prof is not None:
+        start = time.perf_counter()
+        prof.emit('kalmar', {'vector': dict(vector)})
     hyp = _build_hypothesis(F, vector)
-    inf_list = []
-    ann_list = []
     vector_copy = {k: v for k, v in vector.items()}
-    _kalmar_helper(F, hyp, inf_list, ann_list, vector_copy, num)
-    return inf_list, ann_list, len(ann_list)
+    if values is None or None in vector.values():
+        values = _vector_values(F, vector)
+    else:
+        values.assign(vector)
+    seq = _kalmar_helper(F, hyp, vector_copy, memo, values)
+    if prof is not None:
+        prof.add_time('kalmar/leaf', time.perf_counter() - start)
+        prof.count('kalmar/lines', len(seq))
+    return seq
 
 
-def _inference_union(xn: Formula, hypothesis: list, inf1: list, inf2: list, F: Formula):
+def _pack_formulas(formulas) -> tuple:
     """
-    For given x1^(a1), ..., x(n-1)^(a(n-1)),  xn |- F
-              x1^(a1), ..., x(n-1)^(a(n-1)), !xn |- F  builds x1^(a1), ..., x(n-1)^(a(n-1)) |- F
+    Flattens formulas into picklable table. Interned nodes can't be sent to another process as is - unpickled copies
+    would not be shared nodes - so every distinct sub-formula becomes one table row referencing earlier rows
 
-    :param xn:              Formula - variable (xn) to be thrown away
-    :param hypothesis:      tuple - x1^(a1), ..., x(n-1)^(a(n-1))
-    :param inf1:            list - first inference sequence     (last variable normal)
-    :param inf2:            list - second inference sequence    (last variable inverted)
-    :param F:               Formula
-    :return:                tuple - inference sequence, annotations, increment
+    :param formulas: iterable of Formula
+    :return: tuple(table of rows ('VAR', name) / ('NOT', i) / ('IMP', i, j), list of row ids of given formulas)
+    """
+    table = []
+    rows = {}
+    ids = []
+    for f in formulas:
+        stack = [f.node]
+        while stack:
+            node = stack[-1]
+            if node in rows:
+                stack.pop()
+                continue
+            pending = [son for son in node.successors if son not in rows]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            rows[node] = len(table)
+            if node.type == 'var':
+                table.append(('VAR', node.name))
+            else:
+                table.append((node.operation, ) + tuple(rows[son] for son in node.successors))
+        ids.append(rows[f.node])
+    return table, ids
+
+
+def _unpack_formulas(table) -> list:
     """
+    Rebuilds shared formula nodes from table made by _pack_formulas
 
-    deducted_f1, deducted_a1, inc1 = deduction_theorem(0, hypothesis, inf1, xn.neg())                   # !xn -> F
-    f1 = deducted_f1[-1]
-    deducted_f2, deducted_a2, inc2 = deduction_theorem(deducted_f1[-1].seq_num, hypothesis, inf2, xn)   # xn -> F
-    f2 = deducted_f2[-1]
-    f3s, ann3s, inc3 = theorem_t7(f2.seq_num, xn, F)                                    # (xn -> F) -> ((!xn -> F) -> F)
-    f3 = f3s[-1]
-    f4, ann4 = MP(f3s[-1].seq_num + 1, f2, f3)                                          # ((!xn -> F) -> F)
-    f5, ann5 = MP(f4.seq_num + 1, f1, f4)                                               # F
+    :param table: list of rows
+    :return: list of Formula, one per row
+    """
+    nodes = []
+    for row in table:
+        if row[0] == 'VAR':
+            nodes.append(Formula.var(row[1]))
+        elif row[0] == 'NOT':
+            nodes.append(nodes[row[1]].neg())
+        else:
+            nodes.append(nodes[row[1]].imp(nodes[row[2]]))
+    return nodes
 
-    inference = list(deducted_f1) + list(deducted_f2) + list(f3s) + [f4, f5]
-    annotations = deducted_a1 + deducted_a2 + ann3s + [ann4, ann5]
-    return inference, annotations, len(annotations)
 
+def _kalmar_leaf(table: list, vector: dict) -> tuple:
+    """
+    Process pool task: Kalmar inference of packed formula on one leaf vector rebuilt by deduction pass into
+    |- x1^(a1) -> (... (xk^(ak) -> F)), packed back for the parent process. Sub-formula derivations are shared
+    between tasks of one formula run by the same worker, task of another formula drops them
+
+    :param table: list - formula table with formula itself in the last row
+    :param vector: dict - boolean vector represented as {'var_name': value} where value in {0; 1; None}
+    :return: tuple(formula table, lines (rule, formula id, axiom num, is axiom, operand ids, premise numbers)),
+             lines are numbered from 1
+    """
+    F = _unpack_formulas(table)[-1]
+    if F.node not in _leaf_memos:
+        _leaf_memos.clear()                     # worker outlives proofs, memos of earlier formulas aren't needed
+        _leaf_memos[F.node] = _KalmarMemo(), F.compile().evaluator()
+    memo, values = _leaf_memos[F.node]
+    inference = _kalmar_inference(F, vector, memo, values)
+    deduced = list(iter_multi_deduction_theorem(0, [], inference, _literals(vector)))
+    table, ids = _pack_formulas([f for line, ann in deduced for f in (line.formula, ) + ann.operands])
+    lines = []
+    pos = 0
+    for line, ann in deduced:
+        operands = len(ann.operands)
+        lines.append((ann.rule, ids[pos], ann.axiom_num, line.is_axiom, tuple(ids[pos + 1:pos + 1 + operands]),
+                      ann.premises))
+        pos += 1 + operands
+    return table, lines
+
+
+def _unpack_leaf(packed: tuple, num: int):
+    """
+    Rebuilds deduced inference of leaf computed in another process, numbered in place
 
-def _formula_from_variable(str_val: str):
+    :param packed: tuple - result of _kalmar_leaf
+    :param num: int - last used index in inference sequence
+    :return: generator of tuples (line, annotation), returns last line
+    """
+    table, lines = packed
+    nodes = _unpack_formulas(table)
+    fs = []
+    line = None
+    for rule, fid, axiom_num, is_axiom, operands, premises in lines:
+        line = Line(nodes[fid], num + len(fs) + 1, is_axiom, axiom_num, tuple(fs[p - 1] for p in premises))
+        fs.append(line)
+        yield line, Annotation(rule, line.seq_num, line.formula, axiom_num, tuple(nodes[j] for j in operands),
+                               tuple(p + num for p in premises))
+    return line
+
+
+def _serial_leaves(F: Formula, variables: tuple):
     """
-    Transforms a variable name string into a standalone formula object
+    Deduced Kalmar inferences x1^(a1) -> (... (xk^(ak) -> F)) for every leaf vector of _leaf_vectors, in the order
+    _adequacy_helper reaches them, each as function num -> generator of lines numbered from num + 1.
+    Leaves share one bounded memo, so sub-formula derivations are mostly built once per assignment of their own
+    variables and later leaves include the very same sequences. Sub-formula values of full leaves are updated
+    incrementally from leaf to leaf, leaves with unassigned variables are evaluated three-valued
 
-    :param str_val: variable name
-    :return: Formula
+    :param F: Formula
+    :param variables: tuple - sorted variable names of F
+    :return: generator of functions num -> generator of tuples (line, annotation), returning last line
+    """
+    memo = _KalmarMemo()
+    evaluator = F.compile().evaluator()
+    for vector in _leaf_vectors(F, variables):
+        inference = _kalmar_inference(F, vector, memo, evaluator)
+        yield functools.partial(iter_multi_deduction_theorem, hypothesis=[], inference_seq=inference,
+                                discharged=_literals(vector))
+
+
+def _init_worker():
+    """
+    Process pool initializer: worker forked from profiled process must not report into its copy of profiler
+
+    :return: None
+    """
+    profiling.active = None
+
+
+def _parallel_leaves(F: Formula, variables: tuple, workers: int):
+    """
+    Deduced Kalmar inferences for every leaf vector of _leaf_vectors, derived and rebuilt by deduction pass in
+    a process pool, see _serial_leaves. Leaves come in the order _adequacy_helper reaches them: first
+    variable is the most significant one, 0 goes before 1. At most 2 * workers leaves are computed ahead of
+    the consumer. Workers aren't profiled, 'kalmar' event is emitted by parent process when leaf is taken
+
+    :param F: Formula
+    :param variables: tuple - sorted variable names of F
+    :param workers: int - amount of worker processes
+    :return: generator of functions num -> generator of tuples (line, annotation), returning last line
     """
-    wrap = "({})"
-    f = Formula(wrap.format(str_val))
-    f.type = 'variable'
-    f.is_complete = True
-    return f
+    table, ids = _pack_formulas([F])
+    with ProcessPoolExecutor(workers, initializer=_init_worker) as pool:
+        pending = deque()
+        for vector in _leaf_vectors(F, variables):
+            pending.append((vector, pool.submit(_kalmar_leaf, table, vector)))
+            if len(pending) >= 2 * workers:
+                vector, future = pending.popleft()
+                profiling.emit('kalmar', vector=vector)
+                yield functools.partial(_unpack_leaf, future.result())
+        while pending:
+            vector, future = pending.popleft()
+            profiling.emit('kalmar', vector=vector)
+            yield functools.partial(_unpack_leaf, future.result())
+
+
+def _literals(vector: dict) -> list:
+    """
+    :param vector: dict - boolean vector, None for unassigned variables
+    :return: list - x1^(a1), ..., xk^(ak) of assigned variables in vector order
+    """
+    return [Formula.var(xi) if val else Formula.var(xi).neg() for xi, val in vector.items() if val is not None]
 
 
-def _adequacy_recursive_helper(num: int, F: Formula, vector: dict):
+@profiling.timed_steps('union')
+def _inference_union(num: int, hypothesis: list, xn: Formula, f1: Formula, f2: Formula, F: Formula):
+    """
+    For given |- x1^(a1) -> (... (x(n-1)^(a(n-1)) -> (!xn -> F)))
+              |- x1^(a1) -> (... (x(n-1)^(a(n-1)) -> (xn -> F)))  builds |- x1^(a1) -> (... (x(n-1)^(a(n-1)) -> F))
+    by T7 applied under x1^(a1), ..., x(n-1)^(a(n-1)). Sub-inferences aren't walked again, so union costs
+    amount of lines linear in n
+
+    :param num:             int - last used index in inference sequence
+    :param hypothesis:      list - x1^(a1), ..., x(n-1)^(a(n-1))
+    :param xn:              Formula - variable (xn) to be thrown away
+    :param f1:              Line - derived line for inverted xn
+    :param f2:              Line - derived line for normal xn
+    :param F:               Formula
+    :return:                generator of tuples (line, annotation), returns last derived line
     """
-    Recursive helper for adequacy theorem function
+    t7 = theorem_seq(theorem_t7, xn, F)                                                 # (xn -> F) -> ((!xn -> F) -> F)
+    f3 = yield from t7.renumbered_lines(num)
+    step = curried_weaken(f3.seq_num, hypothesis, f3)
+    f3 = step[-1][0] if step else f3
+    step += curried_mp(f3.seq_num, hypothesis, f2, f3)                                  # ((!xn -> F) -> F)
+    step += curried_mp(step[-1][0].seq_num, hypothesis, f1, step[-1][0])                # F
+    yield from step
+    return step[-1][0]
+
+
+def _adequacy_helper(num: int, F: Formula, vector: dict, leaves=None):
+    """
+    Helper for adequacy theorem function. Vector is split on its first unassigned variable until assigned ones
+    decide F, both halves are derived and joined by union. Every leaf inference x1^(a1), ..., xk^(ak) |- F is
+    rebuilt by one deduction pass into |- x1^(a1) -> (... (xk^(ak) -> F)), unions only add lines on top of it.
+    Splits are walked with explicit stack, so amount of variables isn't limited by recursion limit or generator
+    nesting. Inference is produced lazily, so finished lines are not kept around: only last lines of derived
+    halves are, as premise-less copies
 
     :param num:     int - last used index in inference sequence
     :param F:       Formula - tautology formula to be logically inferred thus proven to be a theorem
-    :param vector:  dict - boolean vector represented as {'var_name': value} where value in {0; 1}
-    :return:
+    :param vector:  dict - boolean vector represented as {'var_name': value} where value in {0; 1; None}
+    :param leaves:  iterator - deduced Kalmar inferences of leaf vectors in visiting order, if any, see
+                    _serial_leaves
+    :return:        generator of tuples (line, annotation), returns last derived line
+    """
+    stack = [(_SPLIT, vector, num)]
+    results = []                                                                            # last lines of halves
+    while stack:
+        action, vector, start = stack.pop()
+        hyp = _literals(vector)
+        xi = next((xi for xi, v in vector.items() if v is None), None)                     # first unfilled coord
+        if action == _SPLIT:
+            if _decided(F, vector):                                                         # if F^alpha is derivable
+                if leaves is not None:
+                    last = yield from next(leaves)(num)
+                else:
+                    inference, annotations, inc = kalmar_theorem(num, F, vector)
+                    last = yield from iter_multi_deduction_theorem(num, [], inference, hyp)
+                # emitted lines reference their MP premises, so kept line is a copy without them: otherwise
+                # it would keep every line of its half reachable
+                results.append(last.renumbered(last.seq_num, ()))
+                num = last.seq_num
+                continue
+            stack.append((_UNION, vector, num))
+            stack.append((_SPLIT, {**vector, xi: 1}, None))                                 # fill as True
+            stack.append((_SPLIT, {**vector, xi: 0}, None))                                 # fill as False
+            continue
+        f2 = results.pop()
+        f1 = results.pop()
+        last = yield from _inference_union(num, hyp, Formula.var(xi), f1, f2, F)
+        results.append(last.renumbered(last.seq_num, ()))                                   # premise-less copy
+        num = last.seq_num
+        if profiling.active is not None:
+            profiling.active.count(f'level/{len(hyp)}/unions')
+            profiling.active.count(f'level/{len(hyp)}/lines', num - start)
+            profiling.active.emit('union', {'level': len(hyp), 'variable': xi, 'lines': num - start})
+    return results.pop()
+
+
+def _adequacy_inference(F: Formula, workers: int = None):
     """
-    if not any([v is None for v in vector.values()]):                                       # if vector already formed
-        inference, annotations, inc = kalmar_theorem(num, F, vector)
-        return inference, annotations, inc
+    Inference of tautology F built by adequacy theorem
+
+    :param F: Formula
+    :param workers: int - if greater than 1, Kalmar inferences of leaf vectors are derived by that many processes
+    :return: generator of tuples (formula, annotation)
+    """
+    variables = tuple(sorted(F.variables))      # variable table order depends on formulas built before, sort it
+    vector = {v: None for v in variables}       # vector skeleton "xi": val_i
+    if workers is not None and workers > 1:
+        leaves = _parallel_leaves(F, variables, workers)
     else:
-        for xi, v in vector.items():
-            if v is None:                                                                   # i-th coord is unfilled
-                new_vector = {k: v for k, v in vector.items()}                              # copy a filled part
-                # for each variable X used in formula and given vector V of values assigned to ths variables if
-                # corresponding variable == 1 - add X, otherwise add !X and avoid adding unfilled coordinates which
-                # are supposed to be filled recursively
-                hyp = [_formula_from_variable(F) if val else _formula_from_variable(F).neg()\
-                       for F, val in new_vector.items() if not val is None]
-                new_vector[xi] = 0                                                          # fill as True
-                f1s, ann1s, inc1 = _adequacy_recursive_helper(num, F, new_vector)           # recursive call left
-                new_vector[xi] = 1                                                          # fill as False
-                f2s, ann2s, inc2 = _adequacy_recursive_helper(num + inc1, F, new_vector)    # recursive call right
-                fs, anns, inc = _inference_union(_formula_from_variable(xi), hyp, f1s, f2s, F)
-                return fs, anns, inc
-
-
-def adequacy_theorem(F: Formula):
+        leaves = _serial_leaves(F, variables)
+    return _adequacy_helper(0, F, vector, leaves)
+
+
+def iter_adequacy_proof(F: Formula, backend: str = 'truth_table', workers: int = None):
+    """
+    Streaming adequacy theorem: yields inference lines of tautology F as soon as they are finalized.
+    Yields nothing if F is not a tautology
+
+    :param F: Formula
+    :param backend: str - validity backend used to check F is a tautology: 'truth_table', 'bdd', 'dpll' or 'gray'
+    :param workers: int - amount of processes deriving Kalmar inferences, serial derivation if None or 1
+    :return: generator of tuples (formula, annotation)
+    """
+    if F.is_tautology(backend):
+        yield from _adequacy_inference(F, workers)
+
+
+@profiling.timed('adequacy')
+def adequacy_theorem(F: Formula, backend: str = 'truth_table', sink=None, workers: int = None):
     """
     Adequacy theorem implementation. If formula F is tautology it can be inferred as
     a theorem, formally     |=  F <-> |- F. If formula F is tautology - builds logical inference
     otherwise returns None
 
     :param F: Formula
-    :return:
+    :param backend: str - validity backend used to check F is a tautology: 'truth_table', 'bdd', 'dpll' or 'gray'
+    :param sink: text stream or CompactWriter - if given, annotations are written into it one by one instead of
+                 being collected, and amount of written lines is returned
+    :param workers: int - amount of processes deriving Kalmar inferences of leaf vectors, serial if None or 1.
+                    Resulting inference is the same as the serial one
+    :return: tuple - inference sequence, annotations, increment; amount of lines if sink is given
     """
-    if F.is_tautology():
-        amt = len(F.get_vars())
-        variables = tuple(sorted(F.get_vars()))     # get_vars returns unordered set, we'll sort it to restore order
-        vector = {v: None for v in variables}       # vector skeleton "xi": val_i
-        return _adequacy_recursive_helper(amt, F, vector)
-    else:
-        return None, None, None
+    if not F.is_tautology(backend):
+        return None if sink is not None else (None, None, None)
+    lines = _adequacy_inference(F, workers)
+    if sink is not None:
+        write = sink.add if isinstance(sink, CompactWriter) else lambda ann: sink.write(str(ann))
+        amt = 0
+        for f, ann in lines:
+            write(ann)
+            amt += 1
+        return amt
+    inference = []
+    annotations = []
+    for f, ann in lines:
+        inference.append(f)
+        annotations.append(ann)
+    return inference, annotations, len(annotations)
+
+
+@profiling.timed('adequacy')
+def adequacy_proof(F: Formula, backend: str = 'truth_table', workers: int = None):
+    """
+    Adequacy theorem inference of tautology F as compact proof, lines are stored as they are derived
+
+    :param F: Formula
+    :param backend: str - validity backend used to check F is a tautology: 'truth_table', 'bdd', 'dpll' or 'gray'
+    :param workers: int - amount of processes deriving Kalmar inferences, serial derivation if None or 1
+    :return: Proof, None if F is not a tautology
+    """
+    if not F.is_tautology(backend):
+        return None
+    return Proof.from_inference(_adequacy_inference(F, workers))
 
 
 if __name__ == '__main__':
-    F = Formula("(F)")
-    F.seq_num = 1
-    F.is_complete = True
-    F.type = "var"
-
-    G = Formula("(G)")
-    G.seq_num = 2
-    G.is_complete = True
-    G.type = "var"
-
-    H = Formula("(H)")
-    H.seq_num = 3
-    H.is_complete = True
-    H.type = "var"
+    F = Formula.var("F")
+    G = Formula.var("G")
+    H = Formula.var("H")
 
     f1 = F.imp(F.neg().neg())
     f2 = F.neg().neg().imp(F)
@@ -0,0 +1,193 @@
+"""
+Opt-in instrumentation of proof engine.
+
+Profiler collects counters (rule applications, theorem builder calls, Kalmar memo hits, lines per adequacy
+recursion level) and timers (theorem builders, Kalmar leaves, deduction passes, unions, whole adequacy inference)
+while it is active, and passes engine events to hooks:
+
+    with Profiler(hooks=[print_event]) as prof:
+        adequacy_theorem(F)
+    prof.dump_json('adequacy.json')
+    prof.dump_stats('adequacy.prof')        # readable by pstats / snakeviz
+
+Instrumented code checks module global `active` only, so with no profiler active overhead is one attribute
+lookup per instrumented call.
+"""
+import contextlib
+import functools
+import json
+import marshal
+import time
+
+
+active = None                           # profiler collecting data at the moment, if any
+
+
+class Profiler:
+    """
+    Counters, timers and event hooks of one profiling session
+    """
+
+    def __init__(self, hooks=()):
+        self.counters = {}              # name -> amount
+        self.timers = {}                # name -> [calls, total seconds]
+        self.hooks = list(hooks)        # functions (event, data) called on every engine event
+        self._previous = None
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, name: str, seconds: float):
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = [0, 0.0]
+        timer[0] += 1
+        timer[1] += seconds
+
+    def emit(self, event: str, data: dict):
+        for hook in self.hooks:
+            hook(event, data)
+
+    def __enter__(self):
+        global active
+        self._previous = active
+        active = self
+        return self
+
+    def __exit__(self, *exc):
+        global active
+        active = self._previous
+        self._previous = None
+
+    def summary(self) -> dict:
+        """
+        :return: dict {'counters': {name: amount}, 'timers': {name: {'calls': int, 'total': seconds}}}
+        """
+        return {
+            'counters': dict(sorted(self.counters.items())),
+            'timers': {name: {'calls': calls, 'total': total} for name, (calls, total) in sorted(self.timers.items())},
+        }
+
+    def dump_json(self, path: str):
+        """
+        Writes summary as JSON
+
+        :param path: str - file path
+        :return: None
+        """
+        with open(path, 'w') as fh:
+            json.dump(self.summary(), fh, indent=2)
+
+    def dump_stats(self, path: str):
+        """
+        Writes timers in the format of cProfile stats file, so they can be loaded by pstats.Stats. Every timer is
+        reported as function 'name' of file 'pymathlogic', its time is inclusive
+
+        :param path: str - file path
+        :return: None
+        """
+        stats = {('pymathlogic', 0, name): (calls, calls, total, total, {})
+                 for name, (calls, total) in self.timers.items()}
+        with open(path, 'wb') as fh:
+            marshal.dump(stats, fh)
+
+
+def emit(event: str, **data):
+    """
+    Passes engine event to hooks of active profiler, if any
+
+    :param event: str - event name, e.g. 'kalmar'
+    :param data: event fields
+    :return: None
+    """
+    if active is not None:
+        active.emit(event, data)
+
+
+@contextlib.contextmanager
+def paused():
+    """
+    Context manager turning profiling off inside its block, e.g. for one-off work that is not part of measured run
+
+    :return: context manager
+    """
+    global active
+    previous = active
+    active = None
+    try:
+        yield
+    finally:
+        active = previous
+
+
+def print_event(event: str, data: dict):
+    """
+    Hook printing events to stdout
+    """
+    print(event, data)
+
+
+def timed(prefix: str):
+    """
+    Decorator counting and timing calls of function as '<prefix>/<function name>' while profiler is active
+
+    :param prefix: str
+    :return: decorator
+    """
+    def decorator(fn):
+        name = f"{prefix}/{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            prof = active
+            if prof is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                prof.add_time(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def timed_steps(name: str):
+    """
+    Decorator timing generator function as 'name' while profiler is active: time spent producing items is summed
+    over the whole run and counted as one call, time consumer spends between items is not counted
+
+    :param name: str - timer name
+    :return: decorator
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            prof = active
+            if prof is None:
+                return fn(*args, **kwargs)
+            return _timed_run(prof, name, fn(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def _timed_run(prof: Profiler, name: str, gen):
+    """
+    :param prof: Profiler
+    :param name: str - timer name
+    :param gen: generator to be timed
+    :return: generator of the same items, returns what gen returns
+    """
+    total = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(gen)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                total += time.perf_counter() - start
+            yield item
+    finally:
+        gen.close()
+        prof.add_time(name, total)
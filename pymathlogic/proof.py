@@ -0,0 +1,718 @@
+"""
+Compact proof store.
+
+Proof is kept column-wise in typed arrays, one item per line: rule, axiom number, sequence number, formula id and
+MP premises as backward distances to premise lines (0 - no premise). Formulas are ids into the proof formula table,
+where every distinct sub-formula is stored once as (operation, left, right) row referencing earlier rows, so a line
+costs a few bytes no matter how big its formula is. Proof keeps no formula objects: annotations are rendered
+from the table on demand.
+
+Inference being built is kept as ProofSeq - rope of shared chunks numbered relative to themselves, so theorems and
+sub-derivations are concatenated without copying their lines and get absolute numbers only when emitted.
+
+On disk proof keeps the same layout: header, offset index of sections, then every column as a fixed-width array
+and variable names. ProofFile maps such file into memory and reads columns right from the mapping, so any line
+is reached without loading the rest.
+"""
+from array import array
+import mmap
+import struct
+import sys
+
+from .formula import Formula
+
+
+HYPOTHESIS = 0
+AXIOM = 1
+AXIOM_COPY = 2              # axiom restated while rebuilding another inference (deduction theorem)
+MP = 3
+
+_VAR = 0
+_NOT = 1
+_IMP = 2
+
+_NODE_CACHE_SIZE = 4096     # formula nodes with known ids and rendered formulas kept for reuse,
+_TEXT_CACHE_SIZE = 4096     # consecutive lines share most of their sub-formulas
+
+HYPOTHESIS_ANNOTATION = "F_{num}: {formula} - Hypothesis\n"
+AXIOM_ANNOTATIONS = {
+    1: "F_{num}: {formula} - Axiom A1 applied to: F: {F}, G: {G}\n",
+    2: "F_{num}: {formula} - Axiom A2 applied to: F: {F}, G: {G}, H: {H}\n",
+    3: "F_{num}: {formula} - Axiom A3 applied to: F: {F}, G: {G}\n",
+}
+AXIOM_COPY_ANNOTATION = "F_{num}: {formula} Axiom  A{axiom_num} from previous inference\n"
+MP_ANNOTATION = "F_{num}: {formula} - Modus ponens rule applied to F_{fNum} and F_{gNum}\n"
+
+
+class Annotation:
+    """
+    Inference line annotation kept as record: rule, line number, formula, axiom schema operands and MP premise
+    numbers. Text is rendered only by str(), so annotations of intermediate inferences are never formatted
+    """
+
+    __slots__ = ('rule', 'num', 'formula', 'axiom_num', 'operands', 'premises')
+
+    def __init__(self, rule: int, num: int, formula, axiom_num: int = 0, operands: tuple = (), premises: tuple = ()):
+        self.rule = rule                    # HYPOTHESIS / AXIOM / AXIOM_COPY / MP
+        self.num = num                      # sequence number of line
+        self.formula = formula              # line formula
+        self.axiom_num = axiom_num          # axiom schema number for axioms and restated axioms
+        self.operands = operands            # formulas axiom schema was applied to
+        self.premises = premises            # sequence numbers of A and A -> B for MP
+
+    def renumbered(self, num: int, formula, premises: tuple = ()):
+        """
+        Same annotation for line copied to another place of inference
+
+        :param num: int - new sequence number
+        :param formula: Formula - copied line
+        :param premises: tuple - new sequence numbers of MP premises
+        :return: Annotation
+        """
+        return Annotation(self.rule, num, formula, self.axiom_num, self.operands, premises if self.rule == MP else ())
+
+    def shifted(self, offset: int):
+        """
+        Same annotation for line moved by offset together with its premises
+
+        :param offset: int
+        :return: Annotation
+        """
+        if not offset:
+            return self
+        return Annotation(self.rule, self.num + offset, self.formula, self.axiom_num, self.operands,
+                          tuple(p + offset for p in self.premises))
+
+    def __str__(self):
+        rule = self.rule
+        if rule == MP:
+            a, b = self.premises
+            return MP_ANNOTATION.format(num=self.num, formula=self.formula, fNum=a, gNum=b)
+        if rule == AXIOM:
+            return AXIOM_ANNOTATIONS[self.axiom_num].format(num=self.num, formula=self.formula,
+                                                            **dict(zip('FGH', self.operands)))
+        if rule == AXIOM_COPY:
+            return AXIOM_COPY_ANNOTATION.format(num=self.num, formula=self.formula, axiom_num=self.axiom_num)
+        return HYPOTHESIS_ANNOTATION.format(num=self.num, formula=self.formula)
+
+    def __repr__(self):
+        return repr(str(self))
+
+
+class Line:
+    """
+    Inference line: immutable formula node with its place in inference - sequence number, axiom flag and MP
+    premises. Formula is shared by any amount of lines, line record is what theorem functions copy and renumber
+    """
+
+    __slots__ = ('formula', 'seq_num', 'is_axiom', 'axiom_num', 'derived_by_mp_from')
+
+    def __init__(self, formula: Formula, seq_num: int = -1, is_axiom: bool = False, axiom_num: int = None,
+                 derived_by_mp_from: tuple = ()):
+        self.formula = formula.node                     # shared formula node
+        self.seq_num = seq_num                          # number in inference sequence
+        self.is_axiom = is_axiom                        # is it axiom
+        self.axiom_num = axiom_num                      # if it is, which form (A1-A3) it meets?
+        self.derived_by_mp_from = derived_by_mp_from    # if we got it using Modus Ponens - lines of A and A -> B
+
+    @property
+    def node(self) -> Formula:
+        return self.formula
+
+    def renumbered(self, seq_num: int, derived_by_mp_from: tuple = None):
+        """
+        Same line moved to another place of inference
+
+        :param seq_num: int - new sequence number
+        :param derived_by_mp_from: tuple - new MP premise lines, kept if not given
+        :return: Line
+        """
+        if derived_by_mp_from is None:
+            derived_by_mp_from = self.derived_by_mp_from
+        return Line(self.formula, seq_num, self.is_axiom, self.axiom_num, derived_by_mp_from)
+
+    def __eq__(self, other):
+        return self.formula is getattr(other, 'node', other)
+
+    def __hash__(self):
+        return hash(self.formula)
+
+    def __str__(self):
+        return str(self.formula)
+
+    def __repr__(self):
+        return f"Line({self.seq_num}, {self.formula})"
+
+
+class ProofSeq:
+    """
+    Inference lines kept as a rope of shared chunks. Lines of a chunk are numbered relative to it: its first line
+    is 1, MP premises preceding the chunk have numbers 0, -1, ... Concatenation is O(1) and doesn't touch lines,
+    absolute numbers are computed only when lines are emitted, so one chunk - instantiated theorem, memorized
+    sub-derivation - is shared by every sequence using it. Sequence numbers of chunk lines stay chunk relative
+    """
+
+    __slots__ = ('_lines', '_annotations', '_left', '_right', '_len')
+
+    def __init__(self, lines=(), annotations=()):
+        """
+        :param lines: sequence of inference lines, numbered from 1
+        :param annotations: sequence of their annotations
+        """
+        assert len(lines) == len(annotations), 'Every line needs annotation'
+        self._lines = lines                 # chunk lines, None for concatenation
+        self._annotations = annotations     # chunk annotations, None for concatenation
+        self._left = None                   # parts of concatenation
+        self._right = None
+        self._len = len(lines)
+
+    def __len__(self):
+        return self._len
+
+    def __add__(self, other):
+        if not other._len:
+            return self
+        if not self._len:
+            return other
+        seq = ProofSeq()
+        seq._lines = seq._annotations = None
+        seq._left = self
+        seq._right = other
+        seq._len = self._len + other._len
+        return seq
+
+    def _chunks(self):
+        """
+        :return: generator of chunks in line order
+        """
+        stack = [self]
+        while stack:
+            seq = stack.pop()
+            if seq._lines is not None:
+                if seq._len:
+                    yield seq
+            else:
+                stack.append(seq._right)
+                stack.append(seq._left)
+
+    @property
+    def last(self) -> Line:
+        """
+        :return: Line - last line, None if sequence is empty
+        """
+        seq = self
+        while seq._lines is None:
+            seq = seq._right
+        return seq._lines[-1] if seq._len else None
+
+    def __iter__(self):
+        for chunk in self._chunks():
+            yield from chunk._lines
+
+    def lines(self, num: int = 0):
+        """
+        Emits lines with absolute numbers, line records are shared with chunks and keep chunk relative numbers,
+        see renumbered_lines
+
+        :param num: int - last used index in inference sequence
+        :return: generator of tuples (line, annotation)
+        """
+        for chunk in self._chunks():
+            for f, ann in zip(chunk._lines, chunk._annotations):
+                yield f, ann.shifted(num)
+            num += chunk._len
+
+    def renumbered_lines(self, num: int = 0):
+        """
+        Emits lines as new records numbered like their annotations: sequence numbers are absolute and MP premises
+        point to renumbered records, formulas stay shared
+
+        :param num: int - last used index in inference sequence
+        :return: generator of tuples (line, annotation), returns last emitted line
+        """
+        copies = {}                         # line -> its latest renumbered record
+        g = None
+        for f, ann in self.lines(num):
+            g = f.renumbered(ann.num, tuple(copies.get(id(p), p) for p in f.derived_by_mp_from))
+            copies[id(f)] = g
+            yield g, ann
+        return g
+
+    def to_lists(self, num: int = 0) -> tuple:
+        """
+        Renumbers lines into inference as produced by theorem functions, see renumbered_lines
+
+        :param num: int - last used index in inference sequence
+        :return: tuple(inference sequence, annotation sequence)
+        """
+        fs = []
+        anns = []
+        for f, ann in self.renumbered_lines(num):
+            fs.append(f)
+            anns.append(ann)
+        return fs, anns
+
+
+_MAGIC = b"PMLPROOF"
+_VERSION = 1
+_HEADER = struct.Struct("<8sHH")                    # magic, version, byte order of columns (0 - little, 1 - big)
+_COLUMNS = (('rules', 'B'), ('axioms', 'B'), ('nums', 'q'), ('formulas', 'I'), ('first', 'I'), ('second', 'I'),
+            ('ops', 'B'), ('lefts', 'I'), ('rights', 'I'))
+_INDEX = struct.Struct("<" + "QQ" * (len(_COLUMNS) + 1))     # (offset, item amount) of every column and of names
+_ALIGN = 8
+
+
+class Proof:
+    """
+    Array-backed proof
+    """
+
+    __slots__ = ('rules', 'axioms', 'nums', 'formulas', 'first', 'second',
+                 'ops', 'lefts', 'rights', 'names', '_rows', '_ids', '_latest', '_texts')
+
+    def __init__(self):
+        self.rules = array('B')             # line -> HYPOTHESIS / AXIOM / AXIOM_COPY / MP
+        self.axioms = array('B')            # line -> axiom number, 0 if line isn't axiom
+        self.nums = array('l')              # line -> sequence number
+        self.formulas = array('I')          # line -> formula id
+        self.first = array('I')             # line -> distance back to MP premise A, 0 if none
+        self.second = array('I')            # line -> distance back to MP premise A -> B, 0 if none
+        self.ops = array('B')               # formula id -> _VAR / _NOT / _IMP
+        self.lefts = array('I')             # formula id -> name index for variable, first son id otherwise
+        self.rights = array('I')            # formula id -> second son id for implication, 0 otherwise
+        self.names = []                     # variable names
+        self._rows = {}                     # (op, left, right) -> formula id
+        self._ids = {}                      # shared node -> formula id, bounded by _NODE_CACHE_SIZE
+        self._latest = {}                   # formula id -> its last line
+        self._texts = {}                    # formula id -> rendered formula, bounded by _TEXT_CACHE_SIZE
+
+    def __len__(self):
+        return len(self.rules)
+
+    def _row(self, op: int, left: int, right: int) -> int:
+        key = (op, left, right)
+        fid = self._rows.get(key)
+        if fid is None:
+            fid = len(self.ops)
+            self.ops.append(op)
+            self.lefts.append(left)
+            self.rights.append(right)
+            self._rows[key] = fid
+        return fid
+
+    def add_formula(self, F: Formula) -> int:
+        """
+        Puts formula and all its sub-formulas into formula table
+
+        :param F: Formula
+        :return: int - formula id
+        """
+        ids = self._ids
+        fid = ids.get(F.node)
+        if fid is not None:
+            return fid
+        if len(ids) >= _NODE_CACHE_SIZE:
+            ids.clear()
+        stack = [F.node]
+        while stack:
+            node = stack[-1]
+            if node in ids:
+                stack.pop()
+                continue
+            pending = [son for son in node.successors if son not in ids]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            if node.type == 'var':
+                if node.name not in self.names:
+                    self.names.append(node.name)
+                ids[node] = self._row(_VAR, self.names.index(node.name), 0)
+            elif node.operation == "NOT":
+                ids[node] = self._row(_NOT, ids[node.successors[0]], 0)
+            else:
+                ids[node] = self._row(_IMP, ids[node.successors[0]], ids[node.successors[1]])
+        return ids[F.node]
+
+    def find_formulas(self, formulas) -> dict:
+        """
+        Looks formulas up in formula table without changing it, so works for ProofFile too. Table is walked once,
+        sons always have smaller ids than their parents
+
+        :param formulas: iterable of Formula
+        :return: dict - formula id -> Formula, formulas missing in table are left out
+        """
+        formulas = {F.node for F in formulas}
+        wanted = {}                         # (op, left, right) of sub-formula, sons as nodes -> node
+        for F in formulas:
+            stack = [F]
+            while stack:
+                node = stack.pop()
+                if node.type == 'var':
+                    wanted[(_VAR, node.name, None)] = node
+                elif node.operation == "NOT":
+                    wanted[(_NOT, node.successors[0], None)] = node
+                    stack.append(node.successors[0])
+                else:
+                    wanted[(_IMP, node.successors[0], node.successors[1])] = node
+                    stack.extend(node.successors)
+        found = {}                          # formula id -> node, for sub-formulas of given formulas only
+        res = {}
+        for fid, op in enumerate(self.ops):
+            if op == _VAR:
+                node = wanted.get((_VAR, self.names[self.lefts[fid]], None))
+            else:
+                node = wanted.get((op, found.get(self.lefts[fid]), found.get(self.rights[fid]) if op == _IMP else None))
+            if node is not None:
+                found[fid] = node
+                if node in formulas:
+                    res[fid] = node
+        return res
+
+    def formula(self, fid: int) -> Formula:
+        """
+        Builds formula from table
+
+        :param fid: int - formula id
+        :return: Formula
+        """
+        memo = {}
+        stack = [fid]
+        while stack:
+            i = stack[-1]
+            op, left, right = self.ops[i], self.lefts[i], self.rights[i]
+            if op == _VAR:
+                memo[i] = Formula.var(self.names[left])
+            elif left not in memo or op == _IMP and right not in memo:
+                stack.extend(j for j in (left, right)[:op] if j not in memo)
+                continue
+            elif op == _NOT:
+                memo[i] = memo[left].neg()
+            else:
+                memo[i] = memo[left].imp(memo[right])
+            stack.pop()
+        return memo[fid]
+
+    def text(self, fid: int) -> str:
+        """
+        Renders formula from table, same as str of Formula
+
+        :param fid: int - formula id
+        :return: str
+        """
+        texts = self._texts
+        res = texts.get(fid)
+        if res is not None:
+            return res
+        pieces = []
+        stack = [fid]
+        ops, lefts, rights, names = self.ops, self.lefts, self.rights, self.names
+        while stack:
+            item = stack.pop()
+            if type(item) is str:
+                pieces.append(item)
+            elif item in texts:
+                pieces.append(texts[item])
+            elif ops[item] == _IMP:
+                stack.extend((')', rights[item], ' -> ', lefts[item], '('))
+            elif ops[item] == _NOT:
+                stack.extend((')', lefts[item], '(!'))
+            else:
+                pieces.append("({})".format(names[lefts[item]]))
+        if len(texts) >= _TEXT_CACHE_SIZE:
+            texts.clear()
+        res = texts[fid] = ''.join(pieces)
+        return res
+
+    def append(self, F: Formula, rule: int, num: int, axiom_num: int = 0, premises: tuple = ()) -> int:
+        """
+        Adds line to proof
+
+        :param F: Formula
+        :param rule: int - HYPOTHESIS, AXIOM, AXIOM_COPY or MP
+        :param num: int - sequence number of line
+        :param axiom_num: int - axiom schema number for axioms
+        :param premises: tuple - line indices of A and A -> B for MP
+        :return: int - line index
+        """
+        line = len(self.rules)
+        fid = self.add_formula(F)
+        self.rules.append(rule)
+        self.axioms.append(axiom_num)
+        self.nums.append(num)
+        self.formulas.append(fid)
+        if premises:
+            a, b = premises
+            self.first.append(line - a)
+            self.second.append(line - b)
+        else:
+            self.first.append(0)
+            self.second.append(0)
+        self._latest[fid] = line
+        return line
+
+    def _premise_line(self, F: Formula, num: int) -> int:
+        """
+        Line index of already added premise F: last line with its formula, unless sequence number says
+        it was an earlier one
+
+        :param F: Formula - premise inference line
+        :param num: int - premise sequence number
+        :return: int
+        """
+        fid = self.add_formula(F)
+        i = self._latest.get(fid)
+        assert i is not None, 'MP premise is not derived earlier in proof'
+        if self.nums[i] != num:
+            i = next((j for j in range(i - 1, -1, -1) if self.nums[j] == num and self.formulas[j] == fid), i)
+        return i
+
+    def add_line(self, F: Line, annotation: Annotation = None) -> int:
+        """
+        Adds inference line as produced by theorem functions: rule is taken from line flags, premises are resolved
+        to earlier lines. Hypothesis lines are copies of their source lines and keep its flags, so annotation
+        (if given) has the final word on hypotheses and restated axioms. Numbers are taken from annotation if given,
+        lines emitted by ProofSeq keep relative ones
+
+        :param F: Line - inference line
+        :param annotation: Annotation - its annotation
+        :return: int - line index
+        """
+        num = F.seq_num if annotation is None else annotation.num
+        if annotation is not None and annotation.rule == HYPOTHESIS:
+            return self.append(F, HYPOTHESIS, num)
+        if F.is_axiom:
+            restated = annotation is not None and annotation.rule == AXIOM_COPY
+            return self.append(F, AXIOM_COPY if restated else AXIOM, num, F.axiom_num)
+        if F.derived_by_mp_from:
+            A, B = F.derived_by_mp_from
+            a, b = (A.seq_num, B.seq_num) if annotation is None else annotation.premises
+            return self.append(F, MP, num, 0, (self._premise_line(A, a), self._premise_line(B, b)))
+        return self.append(F, HYPOTHESIS, num)
+
+    @classmethod
+    def from_inference(cls, inference, annotations=None):
+        """
+        Builds proof from inference sequence
+
+        :param inference: iterable of inference lines, or of tuples (formula, annotation) if annotations aren't given
+        :param annotations: iterable of annotations, one per line
+        :return: Proof
+        """
+        proof = cls()
+        for f, ann in zip(inference, annotations) if annotations is not None else inference:
+            proof.add_line(f, ann)
+        return proof
+
+    def premises(self, line: int) -> tuple:
+        """
+        :param line: int - line index
+        :return: tuple - line indices of MP premises, empty for other rules
+        """
+        if self.rules[line] != MP:
+            return ()
+        return line - self.first[line], line - self.second[line]
+
+    def minimize(self) -> tuple:
+        """
+        Builds smaller proof of the same conclusion (last line): every formula is kept at its first occurrence only,
+        MP premises are redirected there, then lines the conclusion doesn't depend on are dropped. Lines keep their
+        order and are renumbered from 1, formula table is rebuilt from formulas still in use
+
+        :return: tuple (minimized Proof, amount of duplicate lines removed, amount of unused lines removed)
+        """
+        amt = len(self.rules)
+        first_line = {}                                 # formula id -> its first line
+        canonical = array('I', bytes(4 * amt))          # line -> first line with the same formula
+        for line, fid in enumerate(self.formulas):
+            canonical[line] = first_line.setdefault(fid, line)
+        duplicates = amt - len(first_line)
+
+        used = bytearray(amt)
+        if amt:
+            used[canonical[amt - 1]] = 1
+        for line in range(amt - 1, -1, -1):             # premises always precede their consequence
+            if used[line] and self.rules[line] == MP:
+                a, b = self.premises(line)
+                used[canonical[a]] = 1
+                used[canonical[b]] = 1
+        lines = [line for line in range(amt) if used[line]]
+
+        needed = bytearray(len(self.ops))               # sons always precede their formula in table
+        for line in lines:
+            needed[self.formulas[line]] = 1
+        for fid in range(len(self.ops) - 1, -1, -1):
+            if needed[fid] and self.ops[fid] != _VAR:
+                needed[self.lefts[fid]] = 1
+                if self.ops[fid] == _IMP:
+                    needed[self.rights[fid]] = 1
+
+        res = Proof()
+        fids = {}                                       # old formula id -> new one
+        names = {}                                      # old name index -> new one
+        for fid in range(len(self.ops)):
+            if not needed[fid]:
+                continue
+            op, left, right = self.ops[fid], self.lefts[fid], self.rights[fid]
+            if op == _VAR:
+                if left not in names:
+                    names[left] = len(res.names)
+                    res.names.append(self.names[left])
+                fids[fid] = res._row(_VAR, names[left], 0)
+            else:
+                fids[fid] = res._row(op, fids[left], fids[right] if op == _IMP else 0)
+
+        new_lines = {}                                  # old line -> new one
+        for line in lines:
+            new = len(res.rules)
+            new_lines[line] = new
+            fid = fids[self.formulas[line]]
+            res.rules.append(self.rules[line])
+            res.axioms.append(self.axioms[line])
+            res.nums.append(new + 1)
+            res.formulas.append(fid)
+            if self.rules[line] == MP:
+                a, b = self.premises(line)
+                res.first.append(new - new_lines[canonical[a]])
+                res.second.append(new - new_lines[canonical[b]])
+            else:
+                res.first.append(0)
+                res.second.append(0)
+            res._latest[fid] = new
+        return res, duplicates, amt - duplicates - len(lines)
+
+    def _axiom_arguments(self, axiom_num: int, fid: int) -> dict:
+        """
+        Recovers formulas axiom schema was applied to from axiom itself
+
+        :param axiom_num: int - 1, 2 or 3
+        :param fid: int - formula id of axiom
+        :return: dict - {'F': ..., 'G': ...[, 'H': ...]} of rendered formulas
+        """
+        lefts, rights = self.lefts, self.rights
+        left, right = lefts[fid], rights[fid]
+        if axiom_num == 1:                              # F -> (G -> F)
+            args = {'F': left, 'G': lefts[right]}
+        elif axiom_num == 2:                            # (F -> (G -> H)) -> ((F -> G) -> (F -> H))
+            args = {'F': lefts[left], 'G': lefts[rights[left]], 'H': rights[rights[left]]}
+        else:                                           # (!G -> !F) -> ((!G -> F) -> G)
+            args = {'F': rights[lefts[right]], 'G': rights[right]}
+        return {name: self.text(i) for name, i in args.items()}
+
+    def annotation(self, line: int) -> str:
+        """
+        Renders line annotation
+
+        :param line: int - line index
+        :return: str
+        """
+        num = self.nums[line]
+        fid = self.formulas[line]
+        formula = self.text(fid)
+        rule = self.rules[line]
+        if rule == MP:
+            a, b = self.premises(line)
+            return MP_ANNOTATION.format(num=num, formula=formula, fNum=self.nums[a], gNum=self.nums[b])
+        if rule == AXIOM:
+            axiom_num = self.axioms[line]
+            return AXIOM_ANNOTATIONS[axiom_num].format(num=num, formula=formula,
+                                                       **self._axiom_arguments(axiom_num, fid))
+        if rule == AXIOM_COPY:
+            return AXIOM_COPY_ANNOTATION.format(num=num, formula=formula, axiom_num=self.axioms[line])
+        return HYPOTHESIS_ANNOTATION.format(num=num, formula=formula)
+
+    def annotations(self):
+        """
+        :return: generator of annotation strings of every line
+        """
+        for line in range(len(self.rules)):
+            yield self.annotation(line)
+
+    def write(self, sink) -> int:
+        """
+        Writes annotations into text stream
+
+        :param sink: text stream
+        :return: int - amount of written lines
+        """
+        for ann in self.annotations():
+            sink.write(ann)
+        return len(self.rules)
+
+    def save(self, path: str) -> int:
+        """
+        Writes proof into binary file, see ProofFile
+
+        :param path: str - file path
+        :return: int - amount of written bytes
+        """
+        sections = [array(code, getattr(self, name)).tobytes() for name, code in _COLUMNS]
+        sections.append("\0".join(self.names).encode())
+        index = []
+        offset = _HEADER.size + _INDEX.size
+        for (name, code), data in zip(_COLUMNS + (('names', 'B'),), sections):
+            offset += -offset % _ALIGN
+            index.extend((offset, len(data) // array(code).itemsize))
+            offset += len(data)
+        with open(path, 'wb') as fh:
+            fh.write(_HEADER.pack(_MAGIC, _VERSION, sys.byteorder == 'big'))
+            fh.write(_INDEX.pack(*index))
+            for data, pos in zip(sections, index[::2]):
+                fh.write(bytes(pos - fh.tell()))
+                fh.write(data)
+            return fh.tell()
+
+
+class ProofFile(Proof):
+    """
+    Read-only proof mapped from file written by Proof.save. Columns are memory views of the mapping, so opening
+    is instant and pages are read only when lines on them are accessed. Rendering works as for Proof, e.g.
+    annotation(k) for random access and annotations() for lazy iteration
+    """
+
+    __slots__ = ('_file', '_map', '_views')
+
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        try:
+            magic, version, big = _HEADER.unpack_from(self._map)
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f"{path} is not a proof file of version {_VERSION}")
+            if big != (sys.byteorder == 'big'):
+                raise ValueError(f"{path} was written on machine with other byte order")
+            index = _INDEX.unpack_from(self._map, _HEADER.size)
+            data = memoryview(self._map)
+            self._views.append(data)
+            for (name, code), offset, amt in zip(_COLUMNS, index[::2], index[1::2]):
+                view = data[offset:offset + amt * array(code).itemsize].cast(code)
+                self._views.append(view)
+                setattr(self, name, view)
+            offset, amt = index[-2:]
+            self.names = bytes(data[offset:offset + amt]).decode().split("\0") if len(self.ops) else []
+        except Exception:
+            self.close()
+            raise
+        self._rows = None
+        self._ids = None
+        self._latest = None
+        self._texts = {}
+
+    def close(self):
+        """
+        Releases the mapping, proof can't be read afterwards
+
+        :return: None
+        """
+        for view in self._views:
+            view.release()
+        self._views = []
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,4 +1,155 @@
+from collections import Counter, OrderedDict
+import functools
+import threading
+import time
+
 from .formula import Formula
+from .proof import Proof, ProofSeq, Line, Annotation, HYPOTHESIS, AXIOM, AXIOM_COPY, MP as MP_RULE
+from . import profiling
+
+
+_SCHEMA_CACHE_LINES = 32768                             # lines of instantiated theorems kept for repeated arguments
+_PLACEHOLDERS = (Formula.var("\x00F"), Formula.var("\x00G"))   # schema variables, never met in parsed formulas
+_schemas = {}                                           # theorem name -> inference derived over placeholders
+_schema_rules = {}                                      # theorem name -> rule counter name -> amount of lines
+_RULE_COUNTERS = {HYPOTHESIS: 'rule/hypothesis', AXIOM_COPY: 'rule/axiom_copy', MP_RULE: 'rule/MP'}
+_instances = OrderedDict()                              # (theorem name, arguments) -> ProofSeq, least recent first
+_instance_lines = 0                                     # total amount of lines in _instances
+_cache_lock = threading.RLock()                         # guards schemas and instances, reentered while deriving
+                                                        # schema of theorem built from other cached theorems
+
+
+def _derive_schema(theorem, arity: int):
+    """
+    Derives theorem once over placeholder variables, lines are renumbered from 1
+
+    :param theorem: theorem builder function
+    :param arity: int - amount of formula arguments
+    :return: list of tuples (formula node, is axiom, axiom number, MP premise indices, annotation)
+    """
+    fs, anns, inc = theorem(0, *_PLACEHOLDERS[:arity])
+    index = {}                                          # sequence number -> its latest position
+    schema = []
+    for i, (f, ann) in enumerate(zip(fs, anns)):
+        premises = tuple(index[g.seq_num] for g in f.derived_by_mp_from)     # premises may be premise-less copies
+        ann = ann.renumbered(i + 1, f.formula, tuple(p + 1 for p in premises))
+        schema.append((f.formula, f.is_axiom, f.axiom_num, premises, ann))
+        index[f.seq_num] = i
+    return schema
+
+
+def _instantiate(name: str, schema: list, args: tuple):
+    """
+    Instantiated theorem, cached. Cache is bounded by total amount of lines of kept theorems, least recently used
+    ones are dropped first. Result is shared by all callers with the same arguments, so its lines must not be changed.
+    Substitution runs outside of lock, thread that stores its instance first wins
+
+    :param name: str - theorem name
+    :param schema: list - theorem schema, see _derive_schema
+    :param args: tuple - formulas for placeholders
+    :return: ProofSeq - one chunk numbered from 1
+    """
+    global _instance_lines
+    key = (name, args)
+    with _cache_lock:
+        seq = _instances.get(key)
+        if seq is not None:
+            _instances.move_to_end(key)
+            return seq
+    res = _substitute_schema(schema, args)
+    with _cache_lock:
+        seq = _instances.get(key)
+        if seq is not None:
+            _instances.move_to_end(key)
+            return seq
+        _instances[key] = res
+        _instance_lines += len(res)
+        while _instance_lines > _SCHEMA_CACHE_LINES and len(_instances) > 1:
+            _instance_lines -= len(_instances.popitem(last=False)[1])
+    return res
+
+
+def clear_schema_cache(schemas: bool = False):
+    """
+    Drops all cached theorem instances, e.g. when a long running process is done with proofs
+
+    :param schemas: bool - drop derived theorem schemas too, so next calls derive them again
+    :return: None
+    """
+    global _instance_lines
+    with _cache_lock:
+        _instances.clear()
+        _instance_lines = 0
+        if schemas:
+            _schemas.clear()
+            _schema_rules.clear()
+
+
+def _substitute_schema(schema: list, args: tuple) -> ProofSeq:
+    """
+    Substitutes theorem arguments into its schema
+
+    :param schema: list - theorem schema, see _derive_schema
+    :param args: tuple - formulas for placeholders
+    :return: ProofSeq - one chunk numbered from 1
+    """
+    mapping = dict(zip(_PLACEHOLDERS, args))
+    memo = {}
+    fs = []
+    anns = []
+    for node, is_axiom, axiom_num, premises, ann in schema:
+        f = Line(node.substitute(mapping, memo), ann.num, is_axiom, axiom_num, tuple(fs[i] for i in premises))
+        fs.append(f)
+        operands = tuple(g.substitute(mapping, memo) for g in ann.operands)
+        anns.append(Annotation(ann.rule, ann.num, f.formula, ann.axiom_num, operands, ann.premises))
+    return ProofSeq(fs, anns)
+
+
+def _schema_cached(theorem):
+    """
+    Theorem inference shape depends only on its schema, so every theorem is derived once over placeholder variables
+    and later calls copy that inference with arguments substituted and sequence numbers shifted. Uncopied inference
+    is available as `seq` attribute of the result, see theorem_seq. Both ways are counted and timed by profiler as
+    'theorem/<theorem name>', one-off schema derivation is timed apart as 'theorem/<theorem name>/schema' and its
+    lines aren't counted
+
+    :param theorem: theorem builder function (num, *formulas) -> (inference, annotations, increment)
+    :return: function with the same signature, lines are numbered from num + 1
+    """
+    name = theorem.__name__
+    timer = f"theorem/{name}"
+
+    @functools.wraps(theorem)
+    def seq(*args) -> ProofSeq:
+        prof = profiling.active
+        start = time.perf_counter() if prof is not None else 0.0
+        with _cache_lock:
+            schema = _schemas.get(name)
+            if schema is None:
+                with profiling.paused():
+                    schema = _schemas[name] = _derive_schema(theorem, len(args))
+                _schema_rules[name] = Counter(_RULE_COUNTERS.get(ann.rule, f'rule/A{ann.axiom_num}')
+                                              for *line, ann in schema)
+                if prof is not None:
+                    now = time.perf_counter()
+                    prof.add_time(f"{timer}/schema", now - start)
+                    start = now
+            rules = _schema_rules[name]
+        if prof is None:
+            return _instantiate(name, schema, tuple(a.node for a in args))
+        for counter, amount in rules.items():
+            prof.count(counter, amount)
+        try:
+            return _instantiate(name, schema, tuple(a.node for a in args))
+        finally:
+            prof.add_time(timer, time.perf_counter() - start)
+
+    @functools.wraps(theorem)
+    def cached(num, *args):
+        fs, anns = seq(*args).to_lists(num)
+        return fs, anns, len(anns)
+    cached.seq = seq
+    return cached
 
 
 def axiom_A1(num: int, F: Formula, G: Formula):
@@ -6,16 +157,15 @@ def axiom_A1(num: int, F: Formula, G: Formula):
     A1 axiom schema applied to formula F and G
 
     :param num: sequence number of new formula in inference seq
-    :param F: Formula
-    :param G: Formula
-    :return:  Formula obj, formula annotation string
+    :param F: Formula or Line
+    :param G: Formula or Line
+    :return:  Line obj, formula annotation
     """
-    formula = F.imp(G.imp(F))
-    formula.is_axiom = True
-    formula.axiom_num = 1
-    formula.seq_num = num
-    annotation = "F_{num}: {formula} - Axiom A1 applied to: F: {F}, G: {G}\n"
-    return formula, annotation.format(num=num, formula=formula, F=F, G=G)
+    F, G = F.node, G.node
+    line = Line(F.imp(G.imp(F)), num, True, 1)
+    if profiling.active is not None:
+        profiling.active.count('rule/A1')
+    return line, Annotation(AXIOM, num, line.formula, 1, (F, G))
 
 
 def axiom_A2(num: int, F: Formula, G, H):
@@ -23,19 +173,18 @@ def axiom_A2(num: int, F: Formula, G, H):
     A1 axiom schema applied to formula F and G
 
     :param num: sequence number of new formula in inference seq
-    :param F:   Formula
-    :param G:   Formula
-    :param H:   Formula
-    :return:    Formula obj, formula annotation string
+    :param F:   Formula or Line
+    :param G:   Formula or Line
+    :param H:   Formula or Line
+    :return:    Line obj, formula annotation
     """
+    F, G, H = F.node, G.node, H.node
     left = F.imp(G.imp(H))
     right = (F.imp(G)).imp(F.imp(H))
-    formula = left.imp(right)
-    formula.is_axiom = True
-    formula.axiom_num = 2
-    formula.seq_num = num
-    annotation = "F_{num}: {formula} - Axiom A2 applied to: F: {F}, G: {G}, H: {H}\n"
-    return formula, annotation.format(num=num, formula=formula, F=F, G=G, H=H)
+    line = Line(left.imp(right), num, True, 2)
+    if profiling.active is not None:
+        profiling.active.count('rule/A2')
+    return line, Annotation(AXIOM, num, line.formula, 2, (F, G, H))
 
 
 def axiom_A3(num: int, F: Formula, G: Formula):
@@ -43,53 +192,55 @@ def axiom_A3(num: int, F: Formula, G: Formula):
     A1 axiom schema applied to formula F and G
 
     :param num: sequence number of new formula in inference seq
-    :param F:   Formula
-    :param G:   Formula
-    :return:    Formula obj, formula annotation string
+    :param F:   Formula or Line
+    :param G:   Formula or Line
+    :return:    Line obj, formula annotation
     """
+    F, G = F.node, G.node
     left = G.neg().imp(F.neg())
     right = (G.neg().imp(F)).imp(G)
-    formula = left.imp(right)
-    formula.is_axiom = True
-    formula.axiom_num = 3
-    formula.seq_num = num
-    annotation = "F_{num}: {formula} - Axiom A3 applied to: F: {F}, G: {G}\n"
-    return formula, annotation.format(formula=formula, num=num, F=F, G=G)
+    line = Line(left.imp(right), num, True, 3)
+    if profiling.active is not None:
+        profiling.active.count('rule/A3')
+    return line, Annotation(AXIOM, num, line.formula, 3, (F, G))
 
 
 def from_hypothesis(num: int, F: Formula):
     """
-    Adds formula 'from hypothesis set' which means it changes it sequence number and
-    additionally generates annotation string
+    Adds formula 'from hypothesis set' which means it gets new line with its sequence number and
+    additionally generates annotation. Line restated as hypothesis keeps its flags, so rebuilding inference
+    still sees it as axiom or MP result
 
     :param num: sequence number of new formula in inference seq
-    :param F: Formula
-    :return: Formula obj, formula annotation string
+    :param F: Formula or Line
+    :return: Line obj, formula annotation
     """
-    annotation = "F_{num}: {formula} - Hypothesis\n"
-    G = Formula.copy(F)
-    G.seq_num = num
-    return G, annotation.format(num=num, formula=G)
+    line = F.renumbered(num) if isinstance(F, Line) else Line(F, num)
+    if profiling.active is not None:
+        profiling.active.count('rule/hypothesis')
+    return line, Annotation(HYPOTHESIS, num, line.formula)
 
 
-def MP(num: int, F: Formula, G: Formula):
+def MP(num: int, F: Formula, G: Formula, premises: tuple = None):
     """
     Modus Ponens rule applied to formulas F =  A; G = A -> B
 
     :param num: sequence number of new formula in inference seq
-    :param F:   formula "A"
-    :param G:   formula "A -> B"
-    :return:    Formula obj, formula annotation string
+    :param F:   Line "A"
+    :param G:   Line "A -> B"
+    :param premises: tuple - sequence numbers of F and G, if not their own ones (lines shared by ProofSeq chunks)
+    :return:    Line obj, formula annotation
     """
-    assert G.operation == "IMP", 'Incorrect MP application'
-    assert G.successors[0].str_val == F.str_val
-    formula = G.successors[1]
-    formula.derived_by_mp_from = [F, G]
-    formula.seq_num = num
-    annotation = "F_{num}: {formula} - Modus ponens rule applied to F_{fNum} and F_{gNum}\n"
-    return formula, annotation.format(num=num, formula=formula, fNum=F.seq_num, gNum=G.seq_num)
+    AB = G.node
+    assert AB.operation == "IMP", 'Incorrect MP application'
+    assert AB.successors[0] is F.node
+    line = Line(AB.successors[1], num, derived_by_mp_from=(F, G))
+    if profiling.active is not None:
+        profiling.active.count('rule/MP')
+    return line, Annotation(MP_RULE, num, line.formula, premises=premises or (F.seq_num, G.seq_num))
 
 
+@profiling.timed('theorem')
 def theorem_el(num: int, F: Formula):
     """
     Theorem L implementation. Build logical inference for formula F -> F
@@ -97,7 +248,7 @@ def theorem_el(num: int, F: Formula):
 
     :param F: Formula
     :param num: last used index in inference sequence
-    :return:   tuple (formula objects list, annotation string list, increment of row amount (len formula lst))
+    :return:   tuple (formula objects list, annotation list, increment of row amount (len formula lst))
     """
     lc = num + 1    # local counter
     f1, ann1 = axiom_A2(lc, F, F.imp(F), F)
@@ -110,84 +261,328 @@ def theorem_el(num: int, F: Formula):
     return fs, anns, len(anns)
 
 
-def _find_inference_index_for(inferred: list, F: Formula, A: Formula):
-    """
-    Seeks from tail to head in inference sequence for F -> A formula number
-
-    :param inferred: inference list
-    :return: index in list if occurrence was found, -1 otherwise
-    """
-    cmp_str = F.imp(A).str_val
-    for i in range(len(inferred) - 1, -1, -1):
-        if cmp_str == inferred[i].str_val:
-            return i
-    return -1
-
-
-def deduction_theorem(num: int, hypothesis: list, inference_seq: list, F: Formula):
+@profiling.timed_steps('deduction/pass')
+def iter_deduction_theorem(num: int, hypothesis: list, inference_seq, F: Formula):
     """
-    Deduction theorem implementation
+    Streaming deduction theorem implementation
     For given inference, derived formula H, and another formula F (which is supposed to be part of hypothesis list
     while derivation) rebuild inference such as given
     {Hypothesis set} + F |- H       becomes
     {Hypothesis set}     |- F -> H
+    Inference sequence is consumed lazily and rebuilt formulas are yielded as soon as they are derived
 
     :param num: sequence number of new formula in inference seq
     :param hypothesis: list of formulas used as hypothesis set while derivation
-    :param inference_seq: inference sequence
+    :param inference_seq: iterable - inference sequence
     :param F:          Formula
-    :return: tuple(inference sequence, annotation sequence, amount of formulas in inference sequence)
+    :return: generator of tuples (line, annotation), returns last derived line
     """
-    res = []
-    annotations = []
+    F = F.node
+    derived = {}                            # formula -> its latest occurrence in rebuilt inference, as a copy
+    last = None                             # without MP premises: those would keep every earlier line reachable
+    lines = 0
     local_counter = num
-    for i, fi in enumerate(inference_seq):
+    for fi in inference_seq:
+        step = []
         if fi == F:
-            if res and res[-1].seq_num != local_counter:
-                local_counter = res[-1].seq_num
+            if last is not None and last.seq_num != local_counter:
+                local_counter = last.seq_num
             fs, anns, inc = theorem_el(local_counter, F)
-            res.extend(fs)
-            annotations.extend(anns)
+            step.extend(zip(fs, anns))
             local_counter += inc + 1
         elif fi in hypothesis or fi.is_axiom:
             if fi in hypothesis:                        # if hypothesis -- add in inference row
                 f, ann = from_hypothesis(local_counter, fi)
-                res.append(f)
-                annotations.append(ann)
+                step.append((f, ann))
                 local_counter += 1
             else:
-                f = Formula.copy(fi)
-                f.seq_num = local_counter
-
-                res.append(f)                          # if axiom -- add itself to new inference first of all
-                annotations.append("F_{}: {} Axiom  A{} from previous inference\n".format(local_counter, f.str_val, fi.axiom_num))
+                f = Line(fi.node, local_counter, True, fi.axiom_num)
+                                                        # if axiom -- add itself to new inference first of all
+                step.append((f, Annotation(AXIOM_COPY, local_counter, f.formula, fi.axiom_num)))
+                if profiling.active is not None:
+                    profiling.active.count('rule/axiom_copy')
                 local_counter += 1
-            g, an = axiom_A1(local_counter, f, F)      # then add another one axiom and derive needed
-            res.append(g)
-            annotations.append(an)
-            h, an2 = MP(local_counter + 1, f, g)     # and derive needed
-            local_counter += 1
-            res.append(h)
-            annotations.append(an2)
-            local_counter += 1
+            step.append(axiom_A1(local_counter, f, F))     # then add another one axiom and derive needed
+            step.append(MP(local_counter + 1, f, step[-1][0]))     # and derive needed
+            local_counter += 2
         else:                               # derived by MP from some of the previous
             A, B = fi.derived_by_mp_from    # A = A, B = A -> fi - bigger one (ensured by extension order - line 57)
+            FA = derived.get(F.imp(A.node)) # by induction assumption we were supposed to derive it somewhere before
+            FB = derived.get(F.imp(B.node))
+            assert FA is not None and FB is not None, "supposed to be derived formula was not found in inference list\n"
             f, ans = axiom_A2(local_counter, F, A, fi)
-            res.append(f)
-            annotations.append(ans)
-            j1 = _find_inference_index_for(res, F, A)   # by induction assumption we were supposed to derive it somewhere before
-            j2 = _find_inference_index_for(res, F, B)
-            assert j1 != -1 and j2 != -1, "supposed to be derived formula was not found in inference list\n"
-            FA = res[j1]
-            FB = res[j2]
             f2, anns2 = MP(local_counter + 1, FB, f)
             f3, anns3 = MP(local_counter + 2, FA, f2)
-            res.extend((f2, f3))
-            annotations.extend((anns2, anns3))
+            step.extend(((f, ans), (f2, anns2), (f3, anns3)))
             local_counter += 3
+        for f, ann in step:
+            derived[f.node] = f.renumbered(f.seq_num, ()) if f.derived_by_mp_from else f
+            yield f, ann
+        last = step[-1][0]
+        lines += len(step)
+    if profiling.active is not None:
+        profiling.active.count('deduction/passes')
+        profiling.active.count('deduction/lines', lines)
+    return last
+
+
+def theorem_proof(theorem, *formulas) -> Proof:
+    """
+    Builds compact proof of theorem, e.g. theorem_proof(theorem_t7, F, G)
+
+    :param theorem: theorem builder function (num, *formulas) -> (inference, annotations, increment)
+    :param formulas: theorem arguments
+    :return: Proof
+    """
+    fs, anns, inc = theorem(0, *formulas)
+    return Proof.from_inference(fs, anns)
+
+
+def theorem_seq(theorem, *formulas) -> ProofSeq:
+    """
+    Inference of theorem as ProofSeq numbered from 1, e.g. theorem_seq(theorem_t7, F, G). Schema cached theorems
+    return their shared instantiated chunk, no line is copied
+
+    :param theorem: theorem builder function (num, *formulas) -> (inference, annotations, increment)
+    :param formulas: theorem arguments
+    :return: ProofSeq
+    """
+    seq = getattr(theorem, 'seq', None)
+    if seq is not None:
+        return seq(*formulas)
+    fs, anns, inc = theorem(0, *formulas)
+    shift = 1 - anns[0].num if anns else 0
+    return ProofSeq(fs, [ann.shifted(shift) for ann in anns])
+
+
+def deduction_theorem(num: int, hypothesis: list, inference_seq: list, F: Formula):
+    """
+    Deduction theorem implementation, see iter_deduction_theorem
+    {Hypothesis set} + F |- H       becomes
+    {Hypothesis set}     |- F -> H
+
+    :param num: sequence number of new formula in inference seq
+    :param hypothesis: list of formulas used as hypothesis set while derivation
+    :param inference_seq: inference sequence
+    :param F:          Formula
+    :return: tuple(inference sequence, annotation sequence, amount of formulas in inference sequence)
+    """
+    res = []
+    annotations = []
+    for f, ann in iter_deduction_theorem(num, hypothesis, inference_seq, F):
+        res.append(f)
+        annotations.append(ann)
     return res, annotations, len(annotations)
 
 
+def curried(discharged, F: Formula) -> Formula:
+    """
+    :param discharged: list of formulas A1, ..., Ak
+    :param F: Formula
+    :return: Formula A1 -> (A2 -> ... (Ak -> F))
+    """
+    for A in reversed(discharged):
+        F = A.imp(F)
+    return F
+
+
+def _weaken(num: int, line: Line, A: Formula) -> list:
+    """
+    H |- A -> H, 2 lines numbered from num + 1
+
+    :param num: last used index in inference sequence
+    :param line: Line - derived line H
+    :param A: Formula
+    :return: list of tuples (line, annotation)
+    """
+    f1, ann1 = axiom_A1(num + 1, line, A)                       # H -> (A -> H)
+    f2, ann2 = MP(num + 2, line, f1)                            # A -> H
+    return [(f1, ann1), (f2, ann2)]
+
+
+def _distribute(num: int, imp_line: Line, arg_line: Line) -> list:
+    """
+    A -> (G -> H), A -> G |- A -> H, 3 lines numbered from num + 1
+
+    :param num: last used index in inference sequence
+    :param imp_line: Line - derived line A -> (G -> H)
+    :param arg_line: Line - derived line A -> G
+    :return: list of tuples (line, annotation)
+    """
+    A, GH = imp_line.node.successors
+    G, H = GH.successors
+    f1, ann1 = axiom_A2(num + 1, A, G, H)                       # (A -> (G -> H)) -> ((A -> G) -> (A -> H))
+    f2, ann2 = MP(num + 2, imp_line, f1)                        # (A -> G) -> (A -> H)
+    f3, ann3 = MP(num + 3, arg_line, f2)                        # A -> H
+    return [(f1, ann1), (f2, ann2), (f3, ann3)]
+
+
+def _compose(num: int, pq_line: Line, qr_line: Line) -> list:
+    """
+    P -> Q, Q -> R |- P -> R, 5 lines numbered from num + 1
+
+    :param num: last used index in inference sequence
+    :param pq_line: Line - derived line P -> Q
+    :param qr_line: Line - derived line Q -> R
+    :return: list of tuples (line, annotation)
+    """
+    step = _weaken(num, qr_line, pq_line.node.successors[0])   # P -> (Q -> R)
+    step += _distribute(num + 2, step[-1][0], pq_line)          # P -> R
+    return step
+
+
+def curried_weaken(num: int, discharged, line: Line) -> list:
+    """
+    H |- A1 -> (... (Ak -> H)), 2 * k lines numbered from num + 1
+
+    :param num: last used index in inference sequence
+    :param discharged: list of formulas A1, ..., Ak
+    :param line: Line - derived line H
+    :return: list of tuples (line, annotation)
+    """
+    step = []
+    for A in reversed(discharged):
+        step += _weaken(num + len(step), step[-1][0] if step else line, A)
+    return step
+
+
+def curried_mp(num: int, discharged, line_a: Line, line_ab: Line) -> list:
+    """
+    Modus Ponens under discharged hypotheses
+    A1 -> (... (Ak -> G)), A1 -> (... (Ak -> (G -> H))) |- A1 -> (... (Ak -> H))
+    Uses 3 lines for k = 1 and 10 * k - 11 lines for k > 1, numbered from num + 1
+
+    :param num: last used index in inference sequence
+    :param discharged: list of formulas A1, ..., Ak
+    :param line_a: Line - derived line A1 -> (... (Ak -> G))
+    :param line_ab: Line - derived line A1 -> (... (Ak -> (G -> H)))
+    :return: list of tuples (line, annotation)
+    """
+    if not discharged:
+        return [MP(num + 1, line_a, line_ab)]
+    imp = line_ab
+    step = []
+    if len(discharged) > 1:
+        GH = line_ab.node
+        for _ in discharged:
+            GH = GH.successors[1]
+        G, H = GH.successors
+        # D_i = curried(A_i..A_k, G -> H) -> (curried(A_i..A_k, G) -> curried(A_i..A_k, H)), built for i = k .. 2
+        step.append(axiom_A2(num + 1, discharged[-1], G, H))
+        for A in reversed(discharged[1:-1]):
+            d = step[-1][0]                                                     # X -> (Y -> Z)
+            X, YZ = d.node.successors
+            Y, Z = YZ.successors
+            step += _weaken(num + len(step), d, A)                              # A -> (X -> (Y -> Z))
+            lc = num + len(step)
+            step.append(axiom_A2(lc + 1, A, X, Y.imp(Z)))
+            step.append(MP(lc + 2, step[-2][0], step[-1][0]))                  # (A -> X) -> (A -> (Y -> Z))
+            step.append(axiom_A2(lc + 3, A, Y, Z))                              # (A -> (Y -> Z)) -> ((A -> Y) -> (A -> Z))
+            step += _compose(lc + 3, step[-2][0], step[-1][0])                  # D_i
+        step += _compose(num + len(step), line_ab, step[-1][0])                # A1 -> (Y -> Z)
+        imp = step[-1][0]
+    step += _distribute(num + len(step), imp, line_a)                          # A1 -> Z
+    return step
+
+
+def _curried_hypothesis(num: int, discharged, j: int) -> list:
+    """
+    |- A1 -> (... (Ak -> Aj)), lines numbered from num + 1
+
+    :param num: last used index in inference sequence
+    :param discharged: list of formulas A1, ..., Ak
+    :param j: int - index of Aj in discharged
+    :return: list of tuples (line, annotation)
+    """
+    A = discharged[j]
+    if j == len(discharged) - 1:
+        fs, anns, inc = theorem_el(num, A)                      # A -> A
+        step = list(zip(fs, anns))
+    else:
+        step = [axiom_A1(num + 1, A, discharged[-1])]           # A -> (Ak -> A)
+        for B in reversed(discharged[j + 1:-1]):
+            R = step[-1][0].node.successors[1]
+            lc = num + len(step)
+            step.append(axiom_A1(lc + 1, R, B))                 # R -> (B -> R)
+            step += _compose(lc + 1, step[-2][0], step[-1][0])  # A -> (B -> R)
+    step += curried_weaken(num + len(step), discharged[:j], step[-1][0])
+    return step
+
+
+@profiling.timed_steps('deduction/pass')
+def iter_multi_deduction_theorem(num: int, hypothesis: list, inference_seq, discharged):
+    """
+    Streaming deduction theorem discharging several hypotheses in one pass
+    {Hypothesis set} + A1, ..., Ak |- H     becomes
+    {Hypothesis set}                |- A1 -> (A2 -> ... (Ak -> H))
+    Every line is rebuilt straight into A1 -> (... (Ak -> line)), so inference grows linearly in k instead of
+    tripling on each of k passes of iter_deduction_theorem. Lines are numbered from num + 1
+
+    :param num: last used index in inference sequence
+    :param hypothesis: list of formulas used as hypothesis set while derivation
+    :param inference_seq: iterable - inference sequence
+    :param discharged: list of formulas A1, ..., Ak to be discharged
+    :return: generator of tuples (line, annotation), returns last derived line
+    """
+    discharged = [A.node for A in discharged]
+    position = {A: j for j, A in enumerate(discharged)}        # duplicate hypothesis - the innermost is the cheapest
+    derived = {}                                                # formula -> its latest occurrence in rebuilt inference,
+                                                                # premise-less copy, see iter_deduction_theorem
+    last = None
+    lines = 0
+    local_counter = num
+    for fi in inference_seq:
+        j = position.get(fi.node)
+        if j is not None:
+            step = _curried_hypothesis(local_counter, discharged, j)
+        elif fi in hypothesis or fi.is_axiom:
+            if fi in hypothesis:
+                f, ann = from_hypothesis(local_counter + 1, fi)
+            else:
+                f = Line(fi.node, local_counter + 1, True, fi.axiom_num)
+                ann = Annotation(AXIOM_COPY, local_counter + 1, f.formula, fi.axiom_num)
+                if profiling.active is not None:
+                    profiling.active.count('rule/axiom_copy')
+            step = [(f, ann)] + curried_weaken(local_counter + 1, discharged, f)
+        else:
+            A, B = fi.derived_by_mp_from
+            FA = derived.get(curried(discharged, A.node))
+            FB = derived.get(curried(discharged, B.node))
+            assert FA is not None and FB is not None, "supposed to be derived formula was not found in inference list\n"
+            step = curried_mp(local_counter, discharged, FA, FB)
+        for f, ann in step:
+            derived[f.node] = f.renumbered(f.seq_num, ()) if f.derived_by_mp_from else f
+            yield f, ann
+        last = step[-1][0]
+        local_counter = last.seq_num
+        lines += len(step)
+    if profiling.active is not None:
+        profiling.active.count('deduction/passes')
+        profiling.active.count('deduction/lines', lines)
+    return last
+
+
+def multi_deduction_theorem(num: int, hypothesis: list, inference_seq: list, discharged):
+    """
+    Deduction theorem discharging several hypotheses in one pass, see iter_multi_deduction_theorem
+    {Hypothesis set} + A1, ..., Ak |- H     becomes
+    {Hypothesis set}                |- A1 -> (A2 -> ... (Ak -> H))
+
+    :param num: last used index in inference sequence
+    :param hypothesis: list of formulas used as hypothesis set while derivation
+    :param inference_seq: inference sequence
+    :param discharged: list of formulas A1, ..., Ak to be discharged
+    :return: tuple(inference sequence, annotation sequence, amount of formulas in inference sequence)
+    """
+    res = []
+    annotations = []
+    for f, ann in iter_multi_deduction_theorem(num, hypothesis, inference_seq, discharged):
+        res.append(f)
+        annotations.append(ann)
+    return res, annotations, len(annotations)
+
+
+@_schema_cached
 def theorem_t3(num, F, G):
     """
     Builds inference list for T3 theorem
@@ -202,19 +597,18 @@ def theorem_t3(num, F, G):
     f1, ann1 = from_hypothesis(lc, F)                           # a
     f2, ann2 = from_hypothesis(f1.seq_num + 1, F.neg())         # !a
     f3, ann3 = axiom_A1(f2.seq_num + 1, F, G.neg())             # a -> (!b -> a)
-    f4, ann4 = MP(f3.seq_num + 1, F, f3)                        # !b -> a
+    f4, ann4 = MP(f3.seq_num + 1, f1, f3)                       # !b -> a
     f5, ann5 = axiom_A1(f4.seq_num + 1, f2, G.neg())            # !a -> (!b -> !a)
     f6, ann6 = MP(f5.seq_num + 1, f2, f5)                       # !b -> !a
     f7, ann7 = axiom_A3(f6.seq_num + 1, F, G)                   # (!b -> !a) -> ((!b -> a) -> b)
     f8, ann8 = MP(f7.seq_num + 1, f6, f7)                       # (!b -> a) -> b
     f9, ann9 = MP(f8.seq_num + 1, f4, f8)                       # b
     fs = [f1, f2, f3, f4, f5, f6, f7, f8, f9]
-    hyp = [f2,]                                                                  # first hypothesis
-    deducted_fs, deducted_anns, deducted_num = deduction_theorem(num, hyp, fs, F)
-    deducted_fs, deducted_anns, deducted_num = deduction_theorem(num + 1, [], deducted_fs, f2)
+    deducted_fs, deducted_anns, deducted_num = multi_deduction_theorem(num, [], fs, [f2, f1])
     return deducted_fs, deducted_anns, len(deducted_anns)       # formulas, annotations, increment
 
 
+@profiling.timed('theorem')
 def silogism_s1(num, F, G):
     """
     Builds inference list for silogism S1
@@ -226,7 +620,7 @@ def silogism_s1(num, F, G):
     :return: tuple(inference sequence, annotation sequence, amount of formulas in inference sequence)
     """
     lc = num + 1
-    f1, ann1 = from_hypothesis(lc, F.successors[0]) # a
+    f1, ann1 = from_hypothesis(lc, F.node.successors[0])    # a
     f2, ann2 = from_hypothesis(f1.seq_num + 1, F)           # a->b
     f3, ann3 = from_hypothesis(f2.seq_num + 1, G)           # b->c
     f4, ann4 = MP(f3.seq_num + 1, f1, f2)                   # b
@@ -237,6 +631,7 @@ def silogism_s1(num, F, G):
     return deducted_fs, deducted_ann, len(deducted_ann)
 
 
+@profiling.timed('theorem')
 def silogism_s2(num, F, G):
     """
     Builds inference list for silogism s2
@@ -247,9 +642,8 @@ def silogism_s2(num, F, G):
     :param G: G = b
     :return: tuple(inference sequence, annotation sequence, amount of formulas in inference sequence)
     """
-
     lc = num + 1
-    f1, ann1 = from_hypothesis(lc, F.successors[0])             # a
+    f1, ann1 = from_hypothesis(lc, F.node.successors[0])        # a
     f2, ann2 = from_hypothesis(f1.seq_num + 1, F)               # a->(b->c)
     f3, ann3 = from_hypothesis(f2.seq_num + 1, G)               # b
     f4, ann4 = MP(f3.seq_num + 1, f1, f2)                       # b->c
@@ -260,6 +654,7 @@ def silogism_s2(num, F, G):
     return deducted_fs, deducted_anns, len(deducted_anns)
 
 
+@_schema_cached
 def theorem_t1(num, F):
     """
     Builds inference list for theorem T1
@@ -282,6 +677,7 @@ def theorem_t1(num, F):
     return inference, annotations, len(annotations)
 
 
+@_schema_cached
 def theorem_t2(num, F):
     """
     Builds inference list for theorem T2
@@ -303,6 +699,7 @@ def theorem_t2(num, F):
     return inference, annotations, len(annotations)
 
 
+@_schema_cached
 def theorem_t4(num, F, G):
     """
     Builds inference list for theorem T4
@@ -325,6 +722,7 @@ def theorem_t4(num, F, G):
     return deducted_fs, deducted_anns, len(deducted_anns)
 
 
+@_schema_cached
 def theorem_t5(num, F, G):
     """
     Builds inference list for theorem T5
@@ -376,6 +774,7 @@ def _lemma_t6(num, F, G):
     return deducted_fs, deducted_anns, len(deducted_anns)
 
 
+@_schema_cached
 def theorem_t6(num, F, G):
     """
     Builds inference list for theorem T6
@@ -397,8 +796,7 @@ def theorem_t6(num, F, G):
     f6, ann5 = MP(f5.seq_num + 1, f5, f4)                           # !(F -> G)
 
     fs = [f1] + list(f2s) + list(f3s) + [f4] + [f5] + [f6]
-    deducted_fs, deducted_anns, inc = deduction_theorem(num + 1, [f1, ], fs, f5)
-    deducted_fs, deducted_anns, inc = deduction_theorem(num, [], deducted_fs, f1)
+    deducted_fs, deducted_anns, inc = multi_deduction_theorem(num, [], fs, [f1, f5])
     return deducted_fs, deducted_anns, len(deducted_anns)
 
 
@@ -421,11 +819,11 @@ def _lemma_t7(num, F, G):
     f5, ann5 = MP(f4.seq_num + 1, f4, f3)
 
     fs = [f1] + [f2] + list(f3s) + [f4] + [f5]
-    deducted_fs, deducted_anns, inc = deduction_theorem(num, [f1,], fs, f2)
-    deducted_fs, deducted_anns, inc = deduction_theorem(num + 1, [], deducted_fs, f1)
+    deducted_fs, deducted_anns, inc = multi_deduction_theorem(num, [], fs, [f1, f2])
     return deducted_fs, deducted_anns, len(deducted_anns)
 
 
+@_schema_cached
 def theorem_t7(num, F, G):
     """
     Builds inference for theorem T7
@@ -456,6 +854,5 @@ def theorem_t7(num, F, G):
     f11, ann11 = MP(f10.seq_num + 1, f10, f9)                    # G
 
     fs = list(f1s) + [f2] + list(f3s) + [f4] + [f5] + list(f6s) + list(f7s) + list(f8s) + list(f9s) + [f10] + [f11]
-    deducted_fs, deducted_anns, inc = deduction_theorem(num, [f4, ], fs, f10)
-    deducted_fs, deducted_anns, inc = deduction_theorem(num + 1, [], deducted_fs, f4)
+    deducted_fs, deducted_anns, inc = multi_deduction_theorem(num, [], fs, [f4, f10])
     return deducted_fs, deducted_anns, len(deducted_anns)
@@ -0,0 +1,334 @@
+"""
+Compiled truth table evaluation.
+
+Formula is flattened once into a post-order instruction list over registers (one register per distinct
+sub-formula, first registers hold variables). Program is then run over python big-int bitsets where each bit
+is one row of truth table, so a single pass evaluates up to 2^CHUNK_BITS assignments at once.
+
+IncrementalEvaluator keeps value of every register for one current vector instead: changing a variable
+re-runs only instructions depending on it, so walking assignments in Gray code order (or in any order where
+neighbours differ in few variables) costs a fraction of full evaluation per assignment.
+
+Compiled formula is cached on its root node, so it refers to the root only weakly: otherwise node and program
+would form a reference cycle and the node would outlive its last user until garbage collection.
+"""
+import weakref
+
+
+CHUNK_BITS = 12             # rows per word = 2^CHUNK_BITS
+
+NOT = 0                     # program opcodes, instruction is (opcode, operand register, operand register)
+IMP = 1
+
+
+def _column(bit: int, width: int) -> int:
+    """
+    Builds a word of 2^width rows where row r holds the `bit`-th bit of r
+
+    :param bit: int - bit of row index
+    :param width: int - log2 of rows amount
+    :return: int - bitset
+    """
+    period = 1 << (bit + 1)
+    word = ((1 << (1 << bit)) - 1) << (1 << bit)    # upper half of one period filled
+    while period < (1 << width):
+        word |= word << period
+        period <<= 1
+    return word
+
+
+class CompiledFormula:
+    """
+    Formula flattened into post-order instruction list
+    """
+
+    __slots__ = ('variables', '_nodes', 'program', 'result', '_registers', '_root')
+
+    def __init__(self, F, variables=None):
+        order = []                              # distinct sub-formulas in post-order
+        seen = set()
+        stack = [(F.node, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node in seen:
+                continue
+            if expanded or node.type == 'var':
+                seen.add(node)
+                order.append(node)
+            else:
+                stack.append((node, True))
+                stack.extend((son, False) for son in reversed(node.successors))
+        var_nodes = {node.name: node for node in order if node.type == 'var'}
+        if variables is None:
+            variables = sorted(var_nodes)
+        assert set(var_nodes) <= set(variables), 'Not every variable of formula has a value'
+        self.variables = tuple(variables)
+        register = {}
+        nodes = []                              # register -> sub-formula (None for unused variables)
+        for name in self.variables:
+            register[var_nodes.get(name)] = len(nodes)
+            nodes.append(var_nodes.get(name))
+        self.program = []
+        for node in order:
+            if node.type == 'var':
+                continue
+            register[node] = len(nodes)
+            nodes.append(node)
+            if node.operation == "NOT":
+                self.program.append((NOT, register[node.successors[0]], 0))
+            else:
+                left, right = node.successors
+                self.program.append((IMP, register[left], register[right]))
+        self.result = register[F.node]
+        nodes[self.result] = None                # root is kept weakly, see module docstring
+        self._nodes = nodes
+        self._root = weakref.ref(F.node)
+        self._registers = None
+
+    @property
+    def nodes(self) -> list:
+        """
+        :return: list - register -> sub-formula, None for unused variables
+        """
+        nodes = list(self._nodes)
+        nodes[self.result] = self._root()
+        return nodes
+
+    def register(self, F) -> int:
+        """
+        :param F: Formula - sub-formula of compiled formula
+        :return: int - its register
+        """
+        registers = self._registers
+        if registers is None:
+            registers = self._registers = {node: i for i, node in enumerate(self._nodes) if node is not None}
+        node = F.node
+        res = registers.get(node)
+        if res is None:
+            if node is not self._root():
+                raise KeyError(node)
+            res = self.result
+        return res
+
+    def run(self, words: list, full: int) -> list:
+        """
+        Runs program over bitsets of variables
+
+        :param words: list - one bitset per variable, in `variables` order
+        :param full: int - bitset with every used row set
+        :return: list - registers: bitset for every sub-formula
+        """
+        regs = list(words)
+        append = regs.append
+        for op, a, b in self.program:
+            if op == IMP:
+                append((full ^ regs[a]) | regs[b])
+            else:
+                append(full ^ regs[a])
+        return regs
+
+    def evaluate(self, vector: dict) -> int:
+        """
+        Formula value on given vector
+
+        :param vector: dict - boolean vector represented as {'var_name': value} where value in {0; 1}
+        :return: int 0/1
+        """
+        return self.run([vector[v] for v in self.variables], 1)[self.result]
+
+    def node_values(self, vector: dict) -> dict:
+        """
+        Values of every sub-formula on given vector
+
+        :param vector: dict - boolean vector represented as {'var_name': value} where value in {0; 1}
+        :return: dict - {sub-formula: value}
+        """
+        regs = self.run([vector[v] for v in self.variables], 1)
+        return {node: value for node, value in zip(self.nodes, regs) if node is not None}
+
+    def evaluate_many(self, vectors) -> list:
+        """
+        Formula values on a batch of vectors, evaluated 2^CHUNK_BITS vectors at once
+
+        :param vectors: iterable of dicts - boolean vectors represented as {'var_name': value}
+        :return: list of int 0/1, one per vector
+        """
+        vectors = list(vectors)
+        res = []
+        size = 1 << CHUNK_BITS
+        for start in range(0, len(vectors), size):
+            chunk = vectors[start:start + size]
+            words = []
+            for v in self.variables:
+                word = 0
+                for i, vector in enumerate(chunk):
+                    if vector[v]:
+                        word |= 1 << i
+                words.append(word)
+            value = self.run(words, (1 << len(chunk)) - 1)[self.result]
+            res.extend((value >> i) & 1 for i in range(len(chunk)))
+        return res
+
+    def evaluator(self, vector: dict = None):
+        """
+        :param vector: dict - initial boolean vector, all zeros by default
+        :return: IncrementalEvaluator
+        """
+        return IncrementalEvaluator(self, vector)
+
+    def partial_values(self, vector: dict):
+        """
+        :param vector: dict - boolean vector, None or missing value for unassigned variables
+        :return: PartialValues
+        """
+        return PartialValues(self, vector)
+
+    def find_counterexample(self):
+        """
+        Sweeps the whole truth table chunk by chunk, stopping at the first chunk where formula is false.
+        Rows are ordered as binary numbers with first variable as the most significant bit
+
+        :return: dict - first falsifying vector, None if formula is a tautology
+        """
+        amt = len(self.variables)
+        width = min(amt, CHUNK_BITS)
+        full = (1 << (1 << width)) - 1
+        low = [_column(amt - 1 - i, width) for i in range(amt - width, amt)]     # vary inside chunk
+        for chunk in range(1 << (amt - width)):
+            high = [full if (chunk >> (amt - width - 1 - i)) & 1 else 0 for i in range(amt - width)]
+            value = self.run(high + low, full)[self.result]
+            if value != full:
+                zeros = full ^ value
+                row = (chunk << width) | ((zeros & -zeros).bit_length() - 1)
+                return {v: (row >> (amt - 1 - i)) & 1 for i, v in enumerate(self.variables)}
+        return None
+
+
+class IncrementalEvaluator:
+    """
+    Values of every sub-formula of compiled formula on current vector
+    """
+
+    __slots__ = ('compiled', 'values', 'register', '_affected')
+
+    def __init__(self, compiled: CompiledFormula, vector: dict = None):
+        amt = len(compiled.variables)
+        self.compiled = compiled
+        self.register = compiled.register
+        masks = [1 << i for i in range(amt)]                # register -> variables it depends on
+        for op, a, b in compiled.program:
+            masks.append(masks[a] | masks[b] if op == IMP else masks[a])
+        # variable -> instructions depending on it, in program order
+        self._affected = [[k for k, mask in enumerate(masks[amt:]) if mask >> i & 1] for i in range(amt)]
+        if vector is None:
+            self.values = compiled.run([0] * amt, 1)
+        else:
+            self.values = compiled.run([vector[v] for v in compiled.variables], 1)
+
+    @property
+    def result(self) -> int:
+        """
+        :return: int 0/1 - formula value on current vector
+        """
+        return self.values[self.compiled.result]
+
+    def value(self, F) -> int:
+        """
+        :param F: Formula - sub-formula of compiled formula
+        :return: int 0/1 - its value on current vector
+        """
+        return self.values[self.register(F)]
+
+    def vector(self) -> dict:
+        """
+        :return: dict - current boolean vector {'var_name': value}
+        """
+        return dict(zip(self.compiled.variables, self.values))
+
+    def flip(self, i: int):
+        """
+        Inverts i-th variable and re-evaluates sub-formulas depending on it
+
+        :param i: int - variable position in compiled.variables
+        :return: None
+        """
+        values = self.values
+        program = self.compiled.program
+        base = len(self.compiled.variables)
+        values[i] ^= 1
+        for k in self._affected[i]:
+            op, a, b = program[k]
+            values[base + k] = (1 ^ values[a]) | values[b] if op == IMP else 1 ^ values[a]
+
+    def assign(self, vector: dict):
+        """
+        Moves to given vector flipping variables which differ from current ones
+
+        :param vector: dict - boolean vector represented as {'var_name': value} where value in {0; 1}
+        :return: None
+        """
+        values = self.values
+        for i, v in enumerate(self.compiled.variables):
+            if vector[v] != values[i]:
+                self.flip(i)
+
+    def gray_sweep(self):
+        """
+        Visits every assignment in Gray code order starting from current one, one variable flip per step
+
+        :return: generator yielding evaluator itself at every assignment
+        """
+        amt = len(self.compiled.variables)
+        yield self
+        for step in range(1, 1 << amt):
+            self.flip(amt - 1 - ((step & -step).bit_length() - 1))
+            yield self
+
+
+class PartialValues:
+    """
+    Values of every sub-formula on partial vector in three-valued logic: None where unassigned variables leave
+    sub-formula undecided. Implication is decided by false premise or true conclusion alone
+    """
+
+    __slots__ = ('compiled', 'values')
+
+    def __init__(self, compiled: CompiledFormula, vector: dict):
+        self.compiled = compiled
+        self.values = values = [vector.get(v) for v in compiled.variables]
+        append = values.append
+        for op, a, b in compiled.program:
+            x = values[a]
+            if op == NOT:
+                append(None if x is None else 1 ^ x)
+            elif x == 0 or values[b] == 1:
+                append(1)
+            elif x == 1 and values[b] == 0:
+                append(0)
+            else:
+                append(None)
+
+    @property
+    def result(self):
+        """
+        :return: int 0/1 - formula value, None if partial vector doesn't decide it
+        """
+        return self.values[self.compiled.result]
+
+    def value(self, F):
+        """
+        :param F: Formula - sub-formula of compiled formula
+        :return: int 0/1 - its value, None if undecided
+        """
+        return self.values[self.compiled.register(F)]
+
+
+def compile_formula(F, variables=None) -> CompiledFormula:
+    """
+    Flattens formula into instruction list
+
+    :param F: Formula
+    :param variables: ordered variable names, sorted formula variables by default
+    :return: CompiledFormula
+    """
+    return CompiledFormula(F, variables)
@@ -0,0 +1,290 @@
+"""
+Validity (tautology) checking backends.
+
+Every backend takes a formula and returns a falsifying boolean vector {'var_name': value}, or None if formula is
+a tautology:
+    truth_table - chunked bitset sweep over all 2^n assignments (see truth_table module)
+    bdd         - reduced ordered binary decision diagram of formula
+    dpll        - DPLL search for a satisfying assignment of !F (Tseitin encoded), no model means |= F
+    gray        - assignments visited in Gray code order, only sub-formulas of the flipped variable re-evaluated
+"""
+from .truth_table import NOT
+
+
+def _truth_table(F):
+    return F.compile().find_counterexample()
+
+
+def _gray(F):
+    for state in F.compile().evaluator().gray_sweep():
+        if not state.result:
+            return state.vector()
+    return None
+
+
+class _BDD:
+    """
+    Reduced ordered binary decision diagram. Node ids 0 and 1 are FALSE and TRUE terminals,
+    every other node is a (level, low, high) triple stored once in unique table
+    """
+
+    def __init__(self, levels: int):
+        self.nodes = [(levels, None, None), (levels, None, None)]
+        self.unique = {}
+        self.neg_cache = {}
+        self.imp_cache = {}
+
+    def mk(self, level: int, low: int, high: int) -> int:
+        if low == high:
+            return low
+        key = (level, low, high)
+        u = self.unique.get(key)
+        if u is None:
+            u = len(self.nodes)
+            self.nodes.append(key)
+            self.unique[key] = u
+        return u
+
+    def neg(self, u: int) -> int:
+        cache = self.neg_cache
+        stack = [u]
+        while stack:                                # node is negated once both its sons are
+            w = stack[-1]
+            if w < 2 or w in cache:
+                stack.pop()
+                continue
+            level, low, high = self.nodes[w]
+            pending = [son for son in (low, high) if son >= 2 and son not in cache]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            cache[w] = self.mk(level, 1 - low if low < 2 else cache[low], 1 - high if high < 2 else cache[high])
+        return 1 - u if u < 2 else cache[u]
+
+    def _imp_known(self, u: int, v: int):
+        """ Result of u -> v if it is terminal or already computed, None otherwise """
+        if u == 0 or v == 1 or u == v:
+            return 1
+        if u == 1:
+            return v
+        if v == 0:
+            return self.neg(u)
+        return self.imp_cache.get((u, v))
+
+    def imp(self, u: int, v: int) -> int:
+        stack = [(u, v)]
+        while stack:                                # pair is applied once both its cofactor pairs are
+            a, b = stack[-1]
+            if self._imp_known(a, b) is not None:
+                stack.pop()
+                continue
+            la, a0, a1 = self.nodes[a]
+            lb, b0, b1 = self.nodes[b]
+            level = min(la, lb)
+            if la != level:
+                a0 = a1 = a
+            if lb != level:
+                b0 = b1 = b
+            low, high = self._imp_known(a0, b0), self._imp_known(a1, b1)
+            if low is None:
+                stack.append((a0, b0))
+            if high is None:
+                stack.append((a1, b1))
+            if low is None or high is None:
+                continue
+            stack.pop()
+            self.imp_cache[(a, b)] = self.mk(level, low, high)
+        return self._imp_known(u, v)
+
+
+def _bdd(F):
+    compiled = F.compile()
+    # variables are ordered by first occurrence in formula, which keeps related variables close to each other
+    order = []
+    seen = set()
+    for node in compiled.nodes[len(compiled.variables):]:
+        for son in node.successors:
+            if son.type == 'var' and son.name not in seen:
+                seen.add(son.name)
+                order.append(son.name)
+    order.extend(name for name in compiled.variables if name not in seen)       # formula is a single variable
+    level = {name: i for i, name in enumerate(order)}
+    bdd = _BDD(len(order))
+    regs = [bdd.mk(level[name], 0, 1) for name in compiled.variables]
+    for op, a, b in compiled.program:
+        regs.append(bdd.neg(regs[a]) if op == NOT else bdd.imp(regs[a], regs[b]))
+    u = regs[compiled.result]
+    if u == 1:
+        return None
+    vector = {v: 0 for v in compiled.variables}
+    while u > 1:                                    # any non-TRUE node has a path to FALSE terminal
+        lvl, low, high = bdd.nodes[u]
+        if low != 1:
+            u = low
+        else:
+            vector[order[lvl]] = 1
+            u = high
+    return vector
+
+
+def _tseitin(compiled):
+    """
+    Encodes !F into CNF. Variable registers become literals 1..n, every implication gets a fresh literal,
+    negation reuses literal of its operand with opposite sign
+
+    :param compiled: CompiledFormula
+    :return: tuple(amount of literals, clause list)
+    """
+    lits = list(range(1, len(compiled.variables) + 1))
+    amt = len(lits)
+    clauses = []
+    for op, a, b in compiled.program:
+        if op == NOT:
+            lits.append(-lits[a])
+        else:                                       # IMP: n <-> (!a | b)
+            amt += 1
+            n, la, lb = amt, lits[a], lits[b]
+            clauses.extend(([-n, -la, lb], [la, n], [-lb, n]))
+            lits.append(n)
+    clauses.append([-lits[compiled.result]])
+    return amt, clauses
+
+
+def _dpll(F):
+    compiled = F.compile()
+    variables = compiled.variables
+    amt, clauses = _tseitin(compiled)
+    value = [0] * (amt + 1)                         # 1 - true, -1 - false, 0 - unassigned
+    watches = {}
+    trail = []
+    for ci, clause in enumerate(clauses):
+        if len(clause) > 1:
+            watches.setdefault(clause[0], []).append(ci)
+            watches.setdefault(clause[1], []).append(ci)
+
+    def assign(lit):
+        value[abs(lit)] = 1 if lit > 0 else -1
+        trail.append(lit)
+
+    def lit_value(lit):
+        v = value[abs(lit)]
+        return v if lit > 0 else -v
+
+    def propagate(head):
+        """ Two watched literals unit propagation, returns False on conflict """
+        while head < len(trail):
+            false_lit = -trail[head]
+            head += 1
+            watching = watches.get(false_lit, [])
+            keep = []
+            for i, ci in enumerate(watching):
+                clause = clauses[ci]
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if lit_value(clause[0]) == 1:
+                    keep.append(ci)
+                    continue
+                for k in range(2, len(clause)):
+                    if lit_value(clause[k]) != -1:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        watches.setdefault(clause[1], []).append(ci)
+                        break
+                else:
+                    keep.append(ci)
+                    if lit_value(clause[0]) == -1:
+                        watches[false_lit] = keep + watching[i + 1:]
+                        return False
+                    assign(clause[0])
+            watches[false_lit] = keep
+        return True
+
+    for clause in clauses:
+        if len(clause) == 1:
+            if lit_value(clause[0]) == -1:
+                return None
+            if lit_value(clause[0]) == 0:
+                assign(clause[0])
+    decisions = []                                  # (trail length before decision, literal, already flipped)
+    ok = propagate(0)
+    while True:
+        if not ok:
+            while decisions and decisions[-1][2]:
+                decisions.pop()
+            if not decisions:
+                return None                         # !F unsatisfiable - F is a tautology
+            start, lit, _ = decisions.pop()
+            for undone in trail[start:]:
+                value[abs(undone)] = 0
+            del trail[start:]
+            decisions.append((start, -lit, True))
+            assign(-lit)
+            ok = propagate(start)
+            continue
+        # deciding input variables is enough: definitional clauses propagate the rest
+        free = next((i for i in range(1, len(variables) + 1) if not value[i]), None)
+        if free is None:
+            return {v: int(value[i + 1] == 1) for i, v in enumerate(variables)}
+        start = len(trail)
+        decisions.append((start, -free, False))     # try 0 first, like truth table order
+        assign(-free)
+        ok = propagate(start)
+
+
+BACKENDS = {
+    'truth_table': _truth_table,
+    'bdd': _bdd,
+    'dpll': _dpll,
+    'gray': _gray,
+}
+
+
+def register_backend(name: str, backend):
+    """
+    Adds validity backend
+
+    :param name: str - backend name to be used in `backend=` arguments
+    :param backend: callable - Formula -> falsifying vector dict or None
+    :return: None
+    """
+    BACKENDS[name] = backend
+
+
+def find_counterexample(F, backend: str = 'truth_table'):
+    """
+    Searches for a boolean vector on which F is false
+
+    :param F: Formula
+    :param backend: str - name of registered backend
+    :return: dict - {'var_name': value} falsifying F, None if F is a tautology
+    """
+    try:
+        check = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f'Unknown validity backend: {backend}') from None
+    return check(F)
+
+
+if __name__ == '__main__':
+    import random
+
+    from .formula import Formula
+
+    def random_formula(names, depth, rng):
+        if depth == 0:
+            return Formula.var(rng.choice(names))
+        if rng.random() < 1 / 3:
+            return random_formula(names, depth - 1, rng).neg()
+        return random_formula(names, depth - 1, rng).imp(random_formula(names, depth - 1, rng))
+
+    # every backend agrees with truth table, counterexamples really falsify formula
+    rng = random.Random(2020)
+    for _ in range(200):
+        F = random_formula(('x1', 'x2', 'x3', 'x4'), rng.randint(1, 5), rng)
+        if rng.random() < 1 / 4:
+            F = F.imp(F)
+        expected = find_counterexample(F) is None
+        for backend in BACKENDS:
+            vector = find_counterexample(F, backend)
+            assert (vector is None) == expected, (backend, F)
+            assert vector is None or F(**vector) == 0, (backend, F, vector)